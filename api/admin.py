@@ -1,7 +1,9 @@
 from django.contrib import admin
-from .models import Prediction,TelegramUser,Membership
+from .models import Prediction,TelegramUser,Membership,PredictionJob,DailyUsage
 
 admin.site.register(Prediction)
 admin.site.register(TelegramUser)
 admin.site.register(Membership)
+admin.site.register(PredictionJob)
+admin.site.register(DailyUsage)
 # Register your models here.
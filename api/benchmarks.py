@@ -0,0 +1,322 @@
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from unittest import mock
+
+import numpy as np
+from django.test import override_settings
+
+from . import charts, predictor, services
+from .model_registry import ModelRegistry
+from .pricestore import FixtureSource
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "ohlcv")
+FIXTURE_TICKER = "BENCH"
+BATCH_TICKERS = [f"BENCH{i}" for i in range(8)]
+PERCENTILES = (50, 90, 95, 99)
+FORECAST_DAYS = 5  # Horizon of the benchmarked prediction, so every chart kind is drawn.
+
+
+def summarize(samples):
+    ms = np.asarray(samples) * 1000
+    summary = {f"p{p}": float(np.percentile(ms, p)) for p in PERCENTILES}
+    summary.update(mean=float(ms.mean()), min=float(ms.min()), max=float(ms.max()), n=len(ms))
+    return summary
+
+
+def time_calls(fn, iterations, setup=None):
+    samples = []
+    for _ in range(iterations):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def peak_memory(fn, setup=None):
+    # Peak Python heap allocated during one call. Native TensorFlow buffers
+    # are not tracked, the process-wide RSS high-water mark is reported too.
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_concurrent(fn, threads, iterations):
+    samples = []
+    lock = threading.Lock()
+
+    def worker():
+        local = time_calls(fn, iterations)
+        with lock:
+            samples.extend(local)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for future in [pool.submit(worker) for _ in range(threads)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+    summary = summarize(samples)
+    summary["throughput_per_s"] = len(samples) / elapsed
+    return summary
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _max_rss_bytes():
+    # Linux carries ru_maxrss over exec(), so a process started from a large
+    # parent would report the parent's peak; VmHWM belongs to this process.
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class BenchmarkSuite:
+    # Offline benchmarks of the prediction pipeline. Prices come from the
+    # bundled fixture through a temporary price store, and chart, lock and
+    # result caches are redirected to a temporary directory for the run.
+
+    def __init__(self, iterations=10, concurrency=(1, 2, 4, 8), log=print):
+        self.iterations = iterations
+        self.concurrency = concurrency
+        self.log = log
+        self.results = {"stages": {}, "concurrency": {}}
+
+    def _setup(self, stack):
+        tmp = stack.enter_context(tempfile.TemporaryDirectory())
+        fixtures = os.path.join(tmp, "fixtures")
+        os.makedirs(fixtures)
+        for ticker in [FIXTURE_TICKER] + BATCH_TICKERS:
+            shutil.copy(os.path.join(FIXTURE_DIR, f"{FIXTURE_TICKER}.csv"), os.path.join(fixtures, f"{ticker}.csv"))
+
+        self.store_dir = os.path.join(tmp, "prices")
+        store = predictor.price_store
+        stack.enter_context(mock.patch.object(store, "root", self.store_dir))
+        stack.enter_context(mock.patch.object(store, "source", FixtureSource(fixtures)))
+        stack.enter_context(mock.patch.object(store, "refresh_seconds", 3600))
+        stack.enter_context(mock.patch.object(charts, "CHART_CACHE_DIR", os.path.join(tmp, "charts")))
+        stack.enter_context(mock.patch.object(services.prediction_flight, "lock_dir", os.path.join(tmp, "locks")))
+        # Precomputed results and cached pages from real runs would turn the
+        # timed stages into cache reads, and the runs must not leave theirs.
+        stack.enter_context(mock.patch.object(services.result_store, "directory", os.path.join(tmp, "precompute")))
+        stack.enter_context(override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "benchmarks"}}))
+        self.chart_dir = os.path.join(tmp, "charts")
+
+    def _clear_prices(self):
+        shutil.rmtree(self.store_dir, ignore_errors=True)
+
+    def _clear_charts(self):
+        shutil.rmtree(self.chart_dir, ignore_errors=True)
+
+    def record(self, name, fn, iterations=None, setup=None):
+        iterations = iterations or self.iterations
+        fn()  # One untimed call so one-off imports do not skew the samples.
+        stage = summarize(time_calls(fn, iterations, setup))
+        stage["peak_python_bytes"] = peak_memory(fn, setup)
+        self.results["stages"][name] = stage
+        self.log(f"{name:<28} p50 {stage['p50']:9.2f} ms  p95 {stage['p95']:9.2f} ms  peak {stage['peak_python_bytes'] / 1e6:7.2f} MB")
+
+    def record_concurrency(self, name, fn):
+        levels = {}
+        for threads in self.concurrency:
+            levels[str(threads)] = run_concurrent(fn, threads, self.iterations)
+            self.log(f"{name:<20} x{threads:<2} p50 {levels[str(threads)]['p50']:9.2f} ms  "
+                     f"{levels[str(threads)]['throughput_per_s']:8.1f} req/s")
+        self.results["concurrency"][name] = levels
+
+    def bench_stages(self):
+        ticker = FIXTURE_TICKER
+        self.record("fetch_stock_data_cold", lambda: predictor.fetch_stock_data(ticker), setup=self._clear_prices)
+        self.record("fetch_stock_data_warm", lambda: predictor.fetch_stock_data(ticker))
+
+        df = predictor.fetch_stock_data(ticker)
+
+        def cold_prediction():
+            registry = ModelRegistry(predictor.MODEL_PATH, warmup_shape=predictor.model_registry.warmup_shape)
+            with mock.patch.object(predictor, "model_registry", registry):
+                predictor.generate_predictions([df])
+
+        self.record("generate_prediction_cold", cold_prediction, iterations=3)
+        self.record("generate_prediction_warm", lambda: predictor.generate_predictions([df]))
+
+        frames = list(predictor.fetch_stock_data_many(BATCH_TICKERS).values())
+        self.record("generate_predictions_x8", lambda: predictor.generate_predictions(frames))
+
+        result = services.run_pipeline(ticker, df, horizon=FORECAST_DAYS)
+        prediction = services.build_prediction(None, result)
+        for kind in charts.chart_kinds(prediction):
+            self.record(f"chart_{kind}_render", lambda kind=kind: charts.get_chart(prediction, kind), setup=self._clear_charts)
+            self.record(f"chart_{kind}_cached", lambda kind=kind: charts.get_chart(prediction, kind))
+
+    def bench_engines(self, engines):
+        self.results["engines"] = {}
+        for engine in engines:
+            try:
+                stage = measure_engine(engine, self.iterations)
+            except RuntimeError as e:
+                self.log(f"engine {engine:<10} skipped: {e}")
+                continue
+            self.results["engines"][engine] = stage
+            self.log(f"engine {engine:<10} load {stage['load_seconds']:6.2f} s  p50 {stage['p50']:9.2f} ms  "
+                     f"max RSS {stage['max_rss_bytes'] / 1e6:7.1f} MB")
+
+    def bench_views(self):
+        from django.contrib.auth.models import User
+        from django.test import Client
+        from rest_framework.test import APIClient
+
+        from .models import Membership
+
+        user, _ = User.objects.get_or_create(username="benchmark")
+        Membership.objects.update_or_create(user=user, defaults={"is_paid": True})
+        clients = threading.local()
+
+        def client(kind):
+            # Test clients keep per-client state, so each thread gets its own.
+            if not hasattr(clients, kind):
+                if kind == "api":
+                    setattr(clients, kind, APIClient())
+                    clients.api.force_authenticate(user)
+                else:
+                    setattr(clients, kind, Client())
+                    clients.web.force_login(user)
+            return getattr(clients, kind)
+
+        def post(kind, path, data, **kwargs):
+            response = client(kind).post(path, data, **kwargs)
+            if response.status_code >= 400:
+                raise RuntimeError(f"{path} returned {response.status_code}: {response.content[:200]!r}")
+
+        predict = lambda: post("api", "/api/v1/predict/", {"ticker": FIXTURE_TICKER})
+        dashboard = lambda: post("web", "/", {"ticker": FIXTURE_TICKER})
+        batch = lambda: post("api", "/api/v1/predict/batch/", {"tickers": BATCH_TICKERS}, format="json")
+
+        self.record("predict_view_miss", predict, setup=services.prediction_cache.clear)
+        self.record("predict_view_hit", predict)
+        self.record("dashboard_hit", dashboard)
+        self.record("batch_view_x8_miss", batch, setup=services.prediction_cache.clear)
+
+        self.record_concurrency("generate_prediction", lambda: predictor.generate_predictions(
+            [predictor.fetch_stock_data(FIXTURE_TICKER)]))
+        self.record_concurrency("predict_view_hit", predict)
+
+    def run(self, views=True, engines=()):
+        with ExitStack() as stack:
+            self._setup(stack)
+            self.bench_stages()
+            if views:
+                self.bench_views()
+        if engines:
+            self.bench_engines(engines)
+
+        self.results.update(
+            commit=git_commit(),
+            created_at=datetime.now(timezone.utc).isoformat(),
+            python=platform.python_version(),
+            iterations=self.iterations,
+            model=predictor.model_registry.stats(),
+            max_rss_bytes=_max_rss_bytes(),
+        )
+        return self.results
+
+
+def compare(current, baseline):
+    # Yields (name, baseline p50, current p50, ratio) for stages in both runs.
+    for name, stage in current["stages"].items():
+        old = baseline.get("stages", {}).get(name)
+        if old:
+            yield name, old["p50"], stage["p50"], stage["p50"] / old["p50"] if old["p50"] else None
+
+
+ENGINE_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import django; django.setup()
+from api import benchmarks, predictor
+model = predictor.load_lstm_model()
+load_seconds = time.perf_counter() - started
+windows = predictor.np.random.default_rng(0).random(predictor.model_registry.warmup_shape)
+stage = benchmarks.summarize(benchmarks.time_calls(lambda: model.predict(windows, batch_size=len(windows), verbose=0), int(sys.argv[1])))
+stage.update(load_seconds=load_seconds, max_rss_bytes=benchmarks._max_rss_bytes())
+print(json.dumps(stage))
+"""
+
+
+def measure_engine(engine, iterations=10):
+    # Loads the model with MODEL_ENGINE=`engine` in a fresh interpreter, so
+    # startup time and RSS include everything that backend imports, then
+    # times forward passes over one backtest-sized batch.
+    env = dict(os.environ, MODEL_ENGINE=engine,
+               DJANGO_SETTINGS_MODULE=os.environ.get("DJANGO_SETTINGS_MODULE", "core.settings"))
+    env.pop("INFERENCE_SOCKET", None)
+    proc = subprocess.run([sys.executable, "-c", ENGINE_SCRIPT, str(iterations)], capture_output=True, text=True, env=env)
+    if proc.returncode:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def measure_imports(modules):
+    # Runs a fresh interpreter with -X importtime that sets up Django and
+    # imports `modules`; returns [(module, self_us, cumulative_us)].
+    code = "import django; django.setup()\n" + "".join(f"import {m}\n" for m in modules)
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get("DJANGO_SETTINGS_MODULE", "core.settings"))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, env=env)
+    if proc.returncode:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    return parse_importtime(proc.stderr)
+
+
+def parse_importtime(output):
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative, name = line[len("import time:"):].split("|", 2)
+        rows.append((name.strip(), int(self_us), int(cumulative)))
+    return rows
+
+
+def import_report(rows, top=15):
+    # Total import time plus the top-level packages that cost the most,
+    # summing the self time of each package's submodules.
+    packages = {}
+    for name, self_us, _ in rows:
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + self_us
+    return {
+        "total_ms": sum(self_us for _, self_us, _ in rows) / 1000,
+        "modules": len(rows),
+        "packages": [(name, us / 1000) for name, us in sorted(packages.items(), key=lambda kv: -kv[1])[:top]],
+    }
@@ -0,0 +1,167 @@
+import io
+import os
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from telegram import InputMediaPhoto, Update
+from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes
+
+from .botqueue import ChatBusy, QueueFull, prediction_queue, run_prediction
+from .models import Prediction, TelegramUser
+from .predictor import parse_horizon
+from .quota import QuotaExceeded, refund, reserve
+from .services import history_buffer
+
+BOT_TOKEN = os.environ.get("BOT_TOKEN")
+BOT_TIMEOUT = 30.0
+
+# Handlers are shared by polling (manage.py telegrambot) and webhook mode
+# (api.webhook, mounted by core/asgi.py).
+
+
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    chat_id = update.effective_chat.id
+    username = update.effective_user.username
+    user, _ = await sync_to_async(User.objects.get_or_create)(username=username)
+    print("----",user.id,"----",user.username)
+    telegram_user, created = await sync_to_async(TelegramUser.objects.get_or_create)(
+        user=user,
+        username=username,
+        chat_id=chat_id
+    )
+    print("----",telegram_user.username,"----",telegram_user.chat_id)
+    if not created and telegram_user.username != username:
+        telegram_user.username = username
+        await sync_to_async(telegram_user.save)()
+    msg = f"Hi @{username}! You've been registered."
+    await update.message.reply_text(msg)
+
+
+async def predict(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if len(context.args) not in (1, 2):
+        await update.message.reply_text("Usage: /predict <TICKER> [DAYS]")
+        return
+    try:
+        horizon = parse_horizon(context.args[1]) if len(context.args) == 2 else 1
+    except ValueError as e:
+        await update.message.reply_text(str(e))
+        return
+
+    ticker = context.args[0].upper()
+    chat_id = update.effective_chat.id
+    print("-----------", ticker, "->", chat_id, "-----------")
+
+    try:
+        tg_user = await sync_to_async(TelegramUser.objects.get)(chat_id=chat_id)
+        user = await sync_to_async(lambda: tg_user.user)()
+    except TelegramUser.DoesNotExist:
+        await update.message.reply_text("Use /start to link your account.")
+        return
+
+    print("----", tg_user.username, "---", ticker)
+
+    try:
+        position = prediction_queue.admit(chat_id)
+    except ChatBusy:
+        await update.message.reply_text("Your previous prediction is still running, please wait for it to finish.")
+        return
+    except QueueFull:
+        await update.message.reply_text("The bot is busy right now, please try again in a minute.")
+        return
+
+    # Until prediction_queue.run() takes over, the slot (and any quota
+    # reserved) must be given back here on every way out.
+    quota_day = None
+    try:
+        quota_day = await sync_to_async(reserve)(user, channel="telegram")
+        if position:
+            await update.message.reply_text(f"You're #{position} in line, your prediction will start shortly.")
+    except QuotaExceeded:
+        prediction_queue.release(chat_id)
+        await update.message.reply_text("Daily limit reached (5 predictions/day). Upgrade to premium for unlimited predictions.")
+        return
+    except BaseException:
+        prediction_queue.release(chat_id)
+        await sync_to_async(refund)(user, quota_day)
+        raise
+
+    try:
+        # The pipeline runs on the bot's worker pool, so the event
+        # loop keeps answering other chats meanwhile.
+        prediction, charts = await prediction_queue.run(chat_id, run_prediction, user, ticker, quota_day, horizon)
+    except Exception as e:
+        await update.message.reply_text(f"Error: {str(e)}")
+        return
+
+    try:
+        text = f"Prediction for {prediction.ticker}: ${prediction.predicted_price}"
+        forecast = prediction.metrics.get("forecast")
+        if forecast:
+            text += f"\n{len(forecast)}-day forecast: " + ", ".join(f"${price:.2f}" for price in forecast)
+        await update.message.reply_text(text)
+        await context.bot.send_media_group(
+            chat_id=chat_id, media=[InputMediaPhoto(io.BytesIO(png)) for png in charts]
+        )
+
+    except Exception as e:
+        await update.message.reply_text(f"Error: {str(e)}")
+
+
+async def latest(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    chat_id = update.effective_chat.id
+
+    try:
+        tg_user = await sync_to_async(TelegramUser.objects.get)(chat_id=chat_id)
+        user = await sync_to_async(lambda: tg_user.user)()
+
+        # Write out buffered predictions so the newest one is included, then
+        # read the newest row straight off the (user, created_at) index.
+        await sync_to_async(history_buffer.flush)()
+        latest_pred = await sync_to_async(
+            Prediction.objects.filter(user=user).order_by("-created_at", "-id").first
+        )()
+        if latest_pred is None:
+            raise Prediction.DoesNotExist
+
+        await update.message.reply_text(
+            f"Latest: {latest_pred.ticker} → ${latest_pred.predicted_price} at {latest_pred.created_at}"
+        )
+
+    except TelegramUser.DoesNotExist:
+        await update.message.reply_text("Use /start to link your account.")
+    except Prediction.DoesNotExist:
+        await update.message.reply_text("No predictions yet.")
+
+
+async def upgrade(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    chat_id = update.effective_chat.id
+    try:
+        tg_user = await sync_to_async(TelegramUser.objects.get)(chat_id=chat_id)
+        user = await sync_to_async(lambda: tg_user.user)()
+        uid = urlsafe_base64_encode(force_bytes(user.id))
+        url = f"{settings.SITE_URL}/telegram-checkout/{uid}/"
+        await update.message.reply_text(f"🚀 Upgrade to premium: {url}")
+    except TelegramUser.DoesNotExist:
+        await update.message.reply_text("Use /start to register first.")
+
+
+HANDLERS = {"start": start, "predict": predict, "latest": latest, "upgrade": upgrade}
+
+
+def build_application(token=None, request=None, webhook=False):
+    # `request` swaps the HTTP layer (tests pass a fake one); webhook mode
+    # has no updater since updates arrive over HTTP instead of long polling.
+    builder = ApplicationBuilder().token(token or BOT_TOKEN).concurrent_updates(True)
+    if request is not None:
+        builder = builder.request(request)
+    else:
+        builder = builder.connect_timeout(BOT_TIMEOUT).read_timeout(BOT_TIMEOUT).write_timeout(BOT_TIMEOUT)
+    if webhook:
+        builder = builder.updater(None)
+    application = builder.build()
+    for command, handler in HANDLERS.items():
+        application.add_handler(CommandHandler(command, handler))
+    return application
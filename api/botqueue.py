@@ -0,0 +1,83 @@
+import asyncio
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections
+
+from .charts import chart_bytes, chart_kinds
+from .config import getenv_int
+from .quota import refund
+from .services import buffer_prediction, predict_ticker
+
+BOT_WORKERS = getenv_int("BOT_WORKERS", 2)
+BOT_MAX_PENDING = getenv_int("BOT_MAX_PENDING", 20)
+BOT_PER_CHAT = getenv_int("BOT_PER_CHAT", 1)
+
+
+class QueueFull(Exception):
+    pass
+
+
+class ChatBusy(Exception):
+    pass
+
+
+class PredictionQueue:
+    # Runs blocking prediction work on a bounded thread pool so the bot's
+    # event loop keeps serving other chats. Admission state is only touched
+    # from the event loop, so it needs no locking.
+
+    def __init__(self, workers=BOT_WORKERS, max_pending=BOT_MAX_PENDING, per_chat=BOT_PER_CHAT):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.per_chat = per_chat
+        self.pending = 0
+        self.by_chat = Counter()
+        self._executor = None
+
+    def admit(self, chat_id):
+        # Claims a slot and returns this request's place in the waiting line
+        # (0 when a worker is free to start it right away).
+        if self.by_chat[chat_id] >= self.per_chat:
+            raise ChatBusy()
+        if self.pending >= self.max_pending:
+            raise QueueFull()
+        position = max(self.pending - self.workers + 1, 0)
+        self.pending += 1
+        self.by_chat[chat_id] += 1
+        return position
+
+    def release(self, chat_id):
+        self.pending -= 1
+        self.by_chat[chat_id] -= 1
+        if not self.by_chat[chat_id]:
+            del self.by_chat[chat_id]
+
+    async def run(self, chat_id, fn, *args):
+        # Runs fn in the pool and releases the slot claimed by admit().
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bot-predict")
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.release(chat_id)
+
+
+def run_prediction(user, ticker, quota_day, horizon=1):
+    # The whole blocking pipeline for one bot request: predict, queue the
+    # history row and render its charts in memory. The quota reservation is
+    # refunded if anything fails.
+    close_old_connections()
+    try:
+        result = predict_ticker(ticker, horizon)
+        prediction = buffer_prediction(user, result)
+        charts = [chart_bytes(prediction, kind) for kind in chart_kinds(prediction)]
+    except Exception:
+        refund(user, quota_day)
+        raise
+    finally:
+        close_old_connections()
+    return prediction, charts
+
+
+prediction_queue = PredictionQueue()
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+
+class ResultCache:
+    # Thread-safe in-process LRU cache with a per-entry TTL and hit/miss
+    # counters for monitoring.
+
+    def __init__(self, max_entries=512, ttl=86400, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= self.clock():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, predicate):
+        with self._lock:
+            stale = [key for key in self._entries if predicate(key)]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class ResultStore:
+    # Results shared across processes as one JSON file per key, written by
+    # the precompute job and read by web workers and the bot on a cache
+    # miss. Each entry keeps how long it took to compute, and every read
+    # is appended to a daily hit log so the time saved can be reported.
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.seconds_saved = 0.0
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(json.dumps(key).encode()).hexdigest() + ".json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get("key") == list(key) else None
+
+    def put(self, key, result, seconds):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"key": list(key), "result": result, "seconds": seconds, "computed_at": time.time()}, f)
+        os.replace(tmp, path)
+
+    def record_hit(self, entry):
+        with self._lock:
+            self.hits += 1
+            self.seconds_saved += entry["seconds"]
+        # Short O_APPEND writes don't interleave, so processes share one log.
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, f"hits-{date.today().isoformat()}.log"), "a") as f:
+            f.write(f"{entry['seconds']:.6f}\n")
+
+    def hit_log(self, day):
+        # (hits, seconds saved) recorded on `day` by every process.
+        try:
+            with open(os.path.join(self.directory, f"hits-{day.isoformat()}.log")) as f:
+                seconds = [float(line) for line in f if line.strip()]
+        except OSError:
+            return 0, 0.0
+        return len(seconds), sum(seconds)
+
+    def prune(self, max_age):
+        # Removes entries and hit logs older than max_age seconds.
+        cutoff = time.time() - max_age
+        removed = 0
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return 0
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.unlink(path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
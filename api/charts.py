@@ -0,0 +1,293 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from .config import getenv, getenv_int
+from .predictor import HISTORY_DAYS, price_store
+from .telemetry import track
+
+CHART_CACHE_DIR = getenv("CHART_CACHE_DIR", "data/charts")
+CHART_KINDS = ("history", "predicted", "forecast")
+# Limits enforced by collect_garbage (manage.py chartgc).
+CHART_MAX_AGE_DAYS = getenv_int("CHART_MAX_AGE_DAYS", 30)
+CHART_MAX_BYTES = getenv_int("CHART_MAX_BYTES", 512 * 1024 * 1024)
+CHART_MAX_FILES = getenv_int("CHART_MAX_FILES", 50000)
+TOUCH_INTERVAL = 86400  # How often a cache hit refreshes a file's last-used time.
+
+# Charts are only ever rendered to PNG; never let matplotlib probe for a GUI.
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+
+class ChartDataMissing(Exception):
+    pass
+
+
+def chart_path(prediction_id, kind):
+    # Relative URL path, served by ChartView and prefixed with "/" by templates.
+    return f"charts/{prediction_id}/{kind}.png"
+
+
+def chart_kinds(prediction):
+    # The forecast chart only exists for multi-day predictions.
+    return CHART_KINDS if "forecast" in prediction.metrics else CHART_KINDS[:2]
+
+
+def plot_urls(prediction):
+    return [chart_path(prediction.pk, kind) for kind in chart_kinds(prediction)]
+
+
+def _new_figure():
+    # A standalone Figure with its own Agg canvas never touches pyplot's
+    # global state, so renders are safe from concurrent threads. matplotlib
+    # is imported on the first render rather than at startup.
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(10, 6))
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def _to_png(fig):
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    return buf.getvalue()
+
+
+def render_history(ticker, dates, closes):
+    fig = _new_figure()
+    ax = fig.add_subplot()
+    ax.plot(dates, closes)
+    ax.set_title(f"{ticker} Closing Price History")
+    ax.grid(True)
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Price (USD)")
+    ax.tick_params(axis="x", labelrotation=45)
+    fig.tight_layout()
+    return _to_png(fig)
+
+
+def render_backtest(ticker, actual, predicted):
+    days = range(len(actual))
+    fig = _new_figure()
+    ax = fig.add_subplot()
+    ax.plot(days, actual, label="Actual", color="blue")
+    ax.plot(days, predicted, label="Predicted", color="orange")
+    ax.set_title(f"{ticker} - Last {len(actual)} Days: Actual vs Predicted", fontsize=14)
+    ax.set_xlabel(f"Day (0 = {len(actual)} days ago)", fontsize=12)
+    ax.set_ylabel("Price (USD)", fontsize=12)
+    ax.legend()
+    ax.grid(True, linestyle="--", alpha=0.5)
+    fig.tight_layout()
+    return _to_png(fig)
+
+
+def render_forecast(ticker, actual, forecast):
+    # Recent closes followed by the forecast path, joined at the last close.
+    days = np.arange(-len(actual) + 1, len(forecast) + 1)
+    fig = _new_figure()
+    ax = fig.add_subplot()
+    ax.plot(days[:len(actual)], actual, label="Actual", color="blue")
+    ax.plot(days[len(actual) - 1:], np.concatenate([actual[-1:], forecast]), label="Forecast",
+            color="green", marker="o", markersize=3)
+    ax.axvline(0, color="grey", linestyle=":")
+    ax.set_title(f"{ticker} - {len(forecast)}-Day Forecast", fontsize=14)
+    ax.set_xlabel("Trading day (0 = last close)", fontsize=12)
+    ax.set_ylabel("Price (USD)", fontsize=12)
+    ax.legend()
+    ax.grid(True, linestyle="--", alpha=0.5)
+    fig.tight_layout()
+    return _to_png(fig)
+
+
+def history_file(ref):
+    return os.path.join(CHART_CACHE_DIR, "series", ref[:2], ref + ".json")
+
+
+def save_history(dates, closes):
+    # The ten-year closes behind a history chart are stored once per
+    # distinct series (in practice once per ticker and daily bar), named by
+    # their hash; predictions keep only that reference. chartgc leaves
+    # these files alone.
+    data = json.dumps({"dates": dates, "close": closes}, separators=(",", ":")).encode()
+    ref = hashlib.sha1(data).hexdigest()
+    path = history_file(ref)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    return ref
+
+
+def load_history(ref):
+    try:
+        with open(history_file(ref)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _history_series(prediction):
+    ref = prediction.metrics.get("history")
+    history = load_history(ref) if ref else None
+    if history is not None:
+        return np.asarray(history["dates"], dtype="datetime64[D]"), np.asarray(history["close"], dtype=np.float64)
+    # Predictions saved before the history was stored, or whose file is gone.
+    last_bar = datetime.strptime(prediction.metrics["last_bar"], "%Y-%m-%d")
+    df = price_store.frame(prediction.ticker, last_bar - timedelta(days=HISTORY_DAYS), last_bar + timedelta(days=1))
+    if df.empty:
+        raise ChartDataMissing("No stored prices for " + prediction.ticker)
+    return df.index.values.astype("datetime64[D]"), df["Close"].values
+
+
+def _chart_inputs(prediction, kind):
+    # Returns (etag, render callable). The etag hashes the exact series the
+    # chart is drawn from, so identical charts share one cached file.
+    if "last_bar" not in prediction.metrics:
+        raise ChartDataMissing("Prediction has no stored series")
+
+    digest = hashlib.sha1(f"{kind}:{prediction.ticker}".encode())
+    if kind == "history":
+        dates, closes = _history_series(prediction)
+        digest.update(np.ascontiguousarray(closes).tobytes())
+        digest.update(dates.tobytes())
+        return digest.hexdigest(), lambda: render_history(prediction.ticker, dates, closes)
+
+    backtest = prediction.metrics.get("backtest")
+    if not backtest:
+        raise ChartDataMissing("Prediction has no stored backtest")
+    actual = np.asarray(backtest["actual"], dtype=np.float64)
+    if kind == "forecast":
+        if "forecast" not in prediction.metrics:
+            raise ChartDataMissing("Prediction has no stored forecast")
+        forecast = np.asarray(prediction.metrics["forecast"], dtype=np.float64)
+        digest.update(actual.tobytes())
+        digest.update(forecast.tobytes())
+        return digest.hexdigest(), lambda: render_forecast(prediction.ticker, actual, forecast)
+
+    predicted = np.asarray(backtest["predicted"], dtype=np.float64)
+    digest.update(actual.tobytes())
+    digest.update(predicted.tobytes())
+    return digest.hexdigest(), lambda: render_backtest(prediction.ticker, actual, predicted)
+
+
+def chart_file(etag):
+    # Content-addressed: identical charts, from any user or day, share one
+    # file. Two-character shards keep directories small.
+    return os.path.join(CHART_CACHE_DIR, etag[:2], etag + ".png")
+
+
+def _touch(path):
+    # Marks the file as used for collect_garbage, at most once a day so
+    # cache hits don't turn into a metadata write each.
+    if time.time() - os.path.getmtime(path) > TOUCH_INTERVAL:
+        os.utime(path)
+
+
+def get_chart(prediction, kind):
+    # Returns (etag, path of the cached PNG), rendering it on first request.
+    if kind not in CHART_KINDS:
+        raise ChartDataMissing("Unknown chart: " + kind)
+    etag, render = _chart_inputs(prediction, kind)
+    path = chart_file(etag)
+    try:
+        _touch(path)
+    except FileNotFoundError:
+        with track("chart_render"):
+            png = render()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(png)
+        os.replace(tmp, path)
+    return etag, path
+
+
+def open_chart(prediction, kind):
+    # get_chart, returning the open file. If chartgc removes the file before
+    # it is opened, the chart is rendered again.
+    etag, path = get_chart(prediction, kind)
+    try:
+        return etag, open(path, "rb")
+    except FileNotFoundError:
+        etag, path = get_chart(prediction, kind)
+        return etag, open(path, "rb")
+
+
+def chart_bytes(prediction, kind):
+    _, f = open_chart(prediction, kind)
+    with f:
+        return f.read()
+
+
+def _chart_files(root):
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            yield path, st.st_mtime, st.st_size
+
+
+def collect_garbage(max_age_days=CHART_MAX_AGE_DAYS, max_bytes=CHART_MAX_BYTES, max_files=CHART_MAX_FILES,
+                    dry_run=False, now=None):
+    # Every cached chart can be re-rendered from its prediction's stored
+    # series, so files are evicted least recently used first: all those
+    # unused for max_age_days, then more until the store fits max_bytes and
+    # max_files. Leftover temp files from interrupted renders go too.
+    now = time.time() if now is None else now
+    cutoff = now - max_age_days * 86400
+    charts, removed = [], []
+    for path, mtime, size in _chart_files(CHART_CACHE_DIR):
+        if path.endswith(".png"):
+            charts.append((mtime, size, path))
+        elif path.endswith(".tmp") and mtime < now - 3600:
+            removed.append((size, path))
+
+    charts.sort()
+    total_bytes = sum(size for _, size, _ in charts)
+    count = len(charts)
+    for mtime, size, path in charts:
+        if mtime >= cutoff and total_bytes <= max_bytes and count <= max_files:
+            break
+        removed.append((size, path))
+        total_bytes -= size
+        count -= 1
+
+    if not dry_run:
+        for _, path in removed:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+    return {
+        "files": count,
+        "bytes": total_bytes,
+        "removed": len(removed),
+        "removed_bytes": sum(size for size, _ in removed),
+    }
+
+
+def collect_legacy(chart_dir, referenced, dry_run=False):
+    # Charts from before the content-addressed store were written per
+    # request under the static root. Old predictions still link to theirs
+    # (`referenced`, absolute paths); every other file there is removed.
+    removed = removed_bytes = 0
+    for path, _, size in list(_chart_files(chart_dir)):
+        if os.path.abspath(path) in referenced:
+            continue
+        if not dry_run:
+            os.unlink(path)
+        removed += 1
+        removed_bytes += size
+    return {"removed": removed, "removed_bytes": removed_bytes}
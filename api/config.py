@@ -0,0 +1,20 @@
+import os
+
+
+def getenv(name, default=None):
+    # Like os.getenv, but a blank value (NAME='' in .env) counts as unset
+    # rather than replacing the default with an empty string.
+    return os.getenv(name) or default
+
+
+def getenv_int(name, default):
+    return int(getenv(name, default))
+
+
+def getenv_float(name, default):
+    return float(getenv(name, default))
+
+
+def getenv_bool(name, default=False):
+    value = getenv(name)
+    return default if value is None else value.lower() in ("1", "true", "yes")
@@ -0,0 +1,80 @@
+import logging
+import re
+import threading
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    # Applies settings.SQLITE_PRAGMAS to every new SQLite connection; other
+    # databases are left alone.
+    if connection.vendor != "sqlite":
+        return
+    cursor = connection.cursor()
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        if not re.fullmatch(r"\w+", str(value)):
+            raise ValueError(f"Invalid value for PRAGMA {name}: {value!r}")
+        cursor.execute(f"PRAGMA {name} = {value}")
+    cursor.close()
+
+
+class WriteBuffer:
+    # Collects writes nobody waits on and hands them to `writer` as one list
+    # inside one transaction, once `max_size` are queued or `max_delay`
+    # seconds after the first, rather than one write transaction each. A
+    # failed batch is logged and dropped.
+
+    def __init__(self, writer, max_size=50, max_delay=2.0):
+        self.writer = writer
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._pending = []
+        self._timer = None
+        self.flushes = self.written = self.dropped = 0
+
+    def add(self, obj):
+        with self._lock:
+            self._pending.append(obj)
+            full = len(self._pending) >= self.max_size
+            if not full and self._timer is None:
+                self._timer = threading.Timer(self.max_delay, self._flush_in_timer)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not batch:
+            return 0
+        try:
+            with transaction.atomic():
+                self.writer(batch)
+        except Exception:
+            logger.exception("Dropped %d buffered writes", len(batch))
+            self.dropped += len(batch)
+            return 0
+        self.flushes += 1
+        self.written += len(batch)
+        return len(batch)
+
+    def _flush_in_timer(self):
+        try:
+            self.flush()
+        finally:
+            # The timer thread ends here; don't leave its connection open.
+            connections.close_all()
+
+    def __len__(self):
+        return len(self._pending)
@@ -0,0 +1,74 @@
+import csv
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+
+EXPORT_CHUNK_SIZE = 2000  # Rows fetched from the database at a time.
+EXPORT_BUFFER_BYTES = 64 * 1024  # Size of each chunk sent to the client.
+
+# Exported columns; the backtest metrics are pulled out of the JSON column
+# by the database so the stored series are never loaded.
+EXPORT_FIELDS = ("id", "ticker", "predicted_price", "created_at", "last_bar", "mae", "rmse", "mape",
+                 "directional_accuracy")
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def export_rows(queryset):
+    # Plain dicts in EXPORT_FIELDS order, streamed from the database.
+    return queryset.values(
+        "id", "ticker", "predicted_price", "created_at",
+        **{key: F(f"metrics__{key}") for key in EXPORT_FIELDS[4:]},
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+class _Echo:
+    # File-like object for csv.writer that hands back the formatted line.
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow([row[field] for field in EXPORT_FIELDS])
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+
+
+def buffered(lines, size=EXPORT_BUFFER_BYTES):
+    # Joins lines into chunks of about `size` bytes, so the response isn't
+    # sent (or compressed) one row at a time.
+    parts, length = [], 0
+    for line in lines:
+        data = line.encode()
+        parts.append(data)
+        length += len(data)
+        if length >= size:
+            yield b"".join(parts)
+            parts, length = [], 0
+    if parts:
+        yield b"".join(parts)
+
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(queryset, fmt, gzip=False):
+    lines = (csv_lines if fmt == "csv" else ndjson_lines)(export_rows(queryset))
+    chunks = buffered(lines)
+    return gzipped(chunks) if gzip else chunks
@@ -0,0 +1,188 @@
+import io
+import logging
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from .telemetry import track
+
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct("!BI")  # status byte, payload length
+OK, ERROR = 0, 1
+
+
+class InferenceUnavailable(OSError):
+    pass
+
+
+class RemoteInferenceError(Exception):
+    pass
+
+
+def _recv_exact(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionResetError("Inference connection closed")
+        buf += chunk
+    return bytes(buf)
+
+
+def send_frame(sock, status, payload):
+    sock.sendall(HEADER.pack(status, len(payload)) + payload)
+
+
+def recv_frame(sock):
+    status, length = HEADER.unpack(_recv_exact(sock, HEADER.size))
+    return status, _recv_exact(sock, length)
+
+
+def dump_array(array):
+    buf = io.BytesIO()
+    np.save(buf, array, allow_pickle=False)
+    return buf.getvalue()
+
+
+def load_array(payload):
+    return np.load(io.BytesIO(payload), allow_pickle=False)
+
+
+class InferenceClient:
+    # Sends windows to the inference server over its Unix socket. Connection
+    # problems raise InferenceUnavailable (an OSError) so callers can fall
+    # back to an in-process model.
+
+    def __init__(self, socket_path, timeout=30.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def predict(self, windows):
+        payload = dump_array(np.ascontiguousarray(windows, dtype=np.float32))
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.timeout)
+                sock.connect(self.socket_path)
+                send_frame(sock, OK, payload)
+                status, body = recv_frame(sock)
+        except OSError as e:
+            raise InferenceUnavailable(f"{self.socket_path}: {e}") from e
+        if status != OK:
+            raise RemoteInferenceError(body.decode(errors="replace"))
+        return load_array(body)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        # One connection may carry several requests in a row.
+        while True:
+            try:
+                _, payload = recv_frame(self.connection)
+            except (ConnectionError, struct.error):
+                return
+            try:
+                result = self.server.inference.predict(load_array(payload))
+                send_frame(self.connection, OK, dump_array(result))
+            except Exception as e:
+                send_frame(self.connection, ERROR, str(e).encode())
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class InferenceServer:
+    # Owns the model for every web worker and bot process on the host.
+    # Requests arriving within `batch_delay` seconds of each other are
+    # concatenated and scored in one forward pass.
+
+    def __init__(self, socket_path, model_fn, batch_delay=0.005, max_batch=4096):
+        self.socket_path = socket_path
+        self.model_fn = model_fn
+        self.batch_delay = batch_delay
+        self.max_batch = max_batch
+        self.requests = self.batches = 0
+        self._queue = queue.Queue()
+        self._stopped = threading.Event()
+        self._server = None
+
+    def predict(self, windows):
+        if windows.ndim != 3:
+            raise ValueError(f"Expected (n, window, features) windows, got shape {windows.shape}")
+        future = Future()
+        self._queue.put((windows, future))
+        return future.result()
+
+    def _collect(self):
+        first = self._queue.get(timeout=0.1)
+        items, size = [first], len(first[0])
+        deadline = time.monotonic() + self.batch_delay
+        while size < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            items.append(item)
+            size += len(item[0])
+        return items
+
+    def _run_batch(self, items):
+        try:
+            batch = np.concatenate([windows for windows, _ in items])
+            with track("inference"):
+                preds = self.model_fn().predict(batch, batch_size=len(batch), verbose=0).reshape(len(batch), -1)
+        except Exception as e:
+            for _, future in items:
+                future.set_exception(e)
+            return
+        self.requests += len(items)
+        self.batches += 1
+        offset = 0
+        for windows, future in items:
+            future.set_result(preds[offset:offset + len(windows)])
+            offset += len(windows)
+
+    def _batch_loop(self):
+        while not self._stopped.is_set():
+            try:
+                items = self._collect()
+            except queue.Empty:
+                continue
+            self._run_batch(items)
+
+    def serve_forever(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)  # Left behind by a previous run.
+        os.makedirs(os.path.dirname(self.socket_path) or ".", exist_ok=True)
+        self._server = _UnixServer(self.socket_path, _Handler)
+        self._server.inference = self
+        threading.Thread(target=self._batch_loop, name="inference-batcher", daemon=True).start()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def shutdown(self):
+        self._stopped.set()
+        if self._server is not None:
+            self._server.shutdown()
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch_requests": self.requests / self.batches if self.batches else 0.0,
+        }
@@ -0,0 +1,121 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .config import getenv_int
+from .models import PredictionJob
+from .quota import refund
+from .services import predict_ticker, record_prediction
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = getenv_int("JOB_WORKERS", 2)
+# A job still running this long after it was claimed is assumed to have
+# lost its worker (restart, OOM kill) and is failed with its quota refunded.
+JOB_LEASE_SECONDS = getenv_int("JOB_LEASE_SECONDS", 600)
+
+
+def claim_next_job():
+    # The conditional UPDATE makes the claim atomic, so several threads or
+    # processes can drain the same table without running a job twice.
+    queued = PredictionJob.objects.filter(status=PredictionJob.QUEUED).order_by("created_at")
+    for job_id in queued.values_list("id", flat=True)[:10]:
+        claimed = PredictionJob.objects.filter(id=job_id, status=PredictionJob.QUEUED).update(
+            status=PredictionJob.RUNNING, started_at=timezone.now()
+        )
+        if claimed:
+            return PredictionJob.objects.select_related("user").get(id=job_id)
+    return None
+
+
+def fail_stale_jobs(lease=JOB_LEASE_SECONDS):
+    # Each job is failed with a conditional UPDATE, so a job is refunded
+    # once even when several processes sweep at the same time.
+    cutoff = timezone.now() - timedelta(seconds=lease)
+    stale = PredictionJob.objects.filter(status=PredictionJob.RUNNING, started_at__lt=cutoff).select_related("user")
+    failed = 0
+    for job in stale[:100]:
+        swept = PredictionJob.objects.filter(id=job.id, status=PredictionJob.RUNNING).update(
+            status=PredictionJob.FAILED, error="The worker stopped before the job finished.",
+            finished_at=timezone.now(),
+        )
+        if swept:
+            logger.warning("Prediction job %s was still running after %ss; marked failed", job.id, lease)
+            refund(job.user, job.quota_day)
+            failed += 1
+    return failed
+
+
+def _finish(job, result):
+    # The prediction is saved in the same transaction as the conditional
+    # UPDATE, and rolled back if fail_stale_jobs gave up on the job meanwhile
+    # (and refunded it), so a swept job never yields a prediction.
+    with transaction.atomic():
+        job.prediction = record_prediction(job.user, result) if result is not None else None
+        finished = PredictionJob.objects.filter(id=job.id, status=PredictionJob.RUNNING).update(
+            prediction=job.prediction, status=job.status, error=job.error, finished_at=job.finished_at,
+        )
+        if not finished:
+            transaction.set_rollback(True)
+            job.prediction = None
+    return finished
+
+
+def run_job(job):
+    result = None
+    try:
+        result = predict_ticker(job.ticker, job.horizon)
+        job.status = PredictionJob.SUCCEEDED
+    except Exception as e:
+        logger.exception("Prediction job %s failed", job.id)
+        job.status = PredictionJob.FAILED
+        job.error = str(e)
+    job.finished_at = timezone.now()
+    try:
+        finished = _finish(job, result)
+    except Exception as e:
+        logger.exception("Prediction job %s failed", job.id)
+        job.status = PredictionJob.FAILED
+        job.error = str(e)
+        finished = _finish(job, None)
+    if finished and job.status == PredictionJob.FAILED:
+        refund(job.user, job.quota_day)
+
+
+def drain():
+    # Run queued jobs until none are left; returns how many were processed.
+    fail_stale_jobs()
+    processed = 0
+    while (job := claim_next_job()) is not None:
+        run_job(job)
+        processed += 1
+    return processed
+
+
+class JobPool:
+    # Local worker threads that drain the job table after each submission,
+    # and once when the web process starts (core.wsgi / core.asgi).
+    def __init__(self, workers):
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _drain_in_thread(self):
+        close_old_connections()
+        try:
+            drain()
+        finally:
+            connection.close()
+
+    def wake(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="prediction-job")
+        self._executor.submit(self._drain_in_thread)
+
+
+job_pool = JobPool(JOB_WORKERS)
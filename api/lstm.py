@@ -0,0 +1,107 @@
+import json
+
+import numpy as np
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0),
+    "tanh": np.tanh,
+    # Same function as 1 / (1 + exp(-x)), without overflow warnings.
+    "sigmoid": lambda x: 0.5 * (np.tanh(0.5 * x) + 1),
+}
+
+
+class NumpyModel:
+    # Inference-only copy of the Keras LSTM/Dense stack that runs on NumPy,
+    # so a process can predict without importing TensorFlow. predict() takes
+    # and returns the same shapes as Keras, so it drops in wherever the
+    # Keras model is used. Weights come from the .keras file once
+    # (manage.py exportmodel) and are stored as a compact .npz.
+
+    def __init__(self, layers, dtype="float32"):
+        # layers: [(config dict, [weight arrays])] in Keras get_weights() order.
+        self.dtype = np.dtype(dtype)
+        self.layers = []
+        for config, weights in layers:
+            if config["type"] not in ("lstm", "dense"):
+                raise ValueError("Unsupported layer type: " + config["type"])
+            self.layers.append((config, [np.asarray(w, dtype=self.dtype) for w in weights]))
+
+    @classmethod
+    def from_keras(cls, model, dtype="float32"):
+        layers = []
+        for layer in model.layers:
+            kind = type(layer).__name__
+            config = layer.get_config()
+            if kind == "LSTM":
+                if config["go_backwards"] or config["stateful"] or not config["use_bias"]:
+                    raise ValueError(f"Unsupported LSTM options in layer {layer.name}")
+                layers.append(({
+                    "type": "lstm",
+                    "activation": config["activation"],
+                    "recurrent_activation": config["recurrent_activation"],
+                    "return_sequences": config["return_sequences"],
+                }, layer.get_weights()))
+            elif kind == "Dense":
+                if not config["use_bias"]:
+                    raise ValueError(f"Unsupported Dense options in layer {layer.name}")
+                layers.append(({"type": "dense", "activation": config["activation"]}, layer.get_weights()))
+            elif kind not in ("InputLayer", "Dropout"):  # No-ops at inference time.
+                raise ValueError(f"Unsupported layer {layer.name} ({kind})")
+        return cls(layers, dtype)
+
+    def save(self, path):
+        arrays = {"config": np.array(json.dumps([config for config, _ in self.layers]))}
+        for i, (_, weights) in enumerate(self.layers):
+            for j, w in enumerate(weights):
+                arrays[f"layer{i}_{j}"] = w
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path, dtype="float32"):
+        with np.load(path, allow_pickle=False) as data:
+            configs = json.loads(str(data["config"]))
+            layers = []
+            for i, config in enumerate(configs):
+                count = 3 if config["type"] == "lstm" else 2
+                layers.append((config, [data[f"layer{i}_{j}"] for j in range(count)]))
+        return cls(layers, dtype)
+
+    def get_weights(self):
+        return [w for _, weights in self.layers for w in weights]
+
+    def _lstm(self, x, config, kernel, recurrent_kernel, bias):
+        # Input projections for every step in one matmul; only the recurrent
+        # part runs step by step. Gates are in Keras order: i, f, c, o.
+        activation = ACTIVATIONS[config["activation"]]
+        recurrent_activation = ACTIVATIONS[config["recurrent_activation"]]
+        n, steps, _ = x.shape
+        units = recurrent_kernel.shape[0]
+        projected = x @ kernel + bias
+        h = np.zeros((n, units), dtype=self.dtype)
+        c = np.zeros((n, units), dtype=self.dtype)
+        outputs = np.empty((n, steps, units), dtype=self.dtype) if config["return_sequences"] else None
+        for t in range(steps):
+            z = projected[:, t] + h @ recurrent_kernel
+            i = recurrent_activation(z[:, :units])
+            f = recurrent_activation(z[:, units:2 * units])
+            g = activation(z[:, 2 * units:3 * units])
+            o = recurrent_activation(z[:, 3 * units:])
+            c = f * c + i * g
+            h = o * activation(c)
+            if outputs is not None:
+                outputs[:, t] = h
+        return h if outputs is None else outputs
+
+    def predict(self, windows, batch_size=None, verbose=0):
+        # batch_size and verbose are accepted for Keras compatibility; the
+        # whole batch is always scored at once.
+        x = np.asarray(windows, dtype=self.dtype)
+        for config, weights in self.layers:
+            if config["type"] == "lstm":
+                x = self._lstm(x, config, *weights)
+            else:
+                kernel, bias = weights
+                x = ACTIVATIONS[config["activation"]](x @ kernel + bias)
+        return x
@@ -0,0 +1,59 @@
+import json
+import os
+import tempfile
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from api.benchmarks import BenchmarkSuite, compare
+
+
+class Command(BaseCommand):
+    help = "Benchmark the prediction pipeline offline and save the results as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=10, help="Timed calls per stage")
+        parser.add_argument("--concurrency", default="1,2,4,8", help="Comma-separated thread counts")
+        parser.add_argument("--output", default="benchmark-results.json", help="Where to write the JSON results")
+        parser.add_argument("--compare", help="Earlier results file to compare p50 latencies against")
+        parser.add_argument("--skip-views", action="store_true", help="Only benchmark the pipeline stages")
+        parser.add_argument("--engines", default="keras,numpy",
+                            help="Model backends to compare in fresh processes (empty to skip)")
+
+    def handle(self, *args, **options):
+        suite = BenchmarkSuite(
+            iterations=options["iterations"],
+            concurrency=[int(n) for n in options["concurrency"].split(",")],
+            log=self.stdout.write,
+        )
+
+        engines = [e for e in options["engines"].split(",") if e]
+        if options["skip_views"]:
+            results = suite.run(views=False, engines=engines)
+        else:
+            results = self.run_with_test_database(suite, engines)
+
+        with open(options["output"], "w") as f:
+            json.dump(results, f, indent=2)
+        self.stdout.write(f"Results written to {options['output']}")
+
+        if options["compare"]:
+            with open(options["compare"]) as f:
+                baseline = json.load(f)
+            self.stdout.write(f"Compared with {baseline.get('commit') or options['compare']}:")
+            for name, old, new, ratio in compare(results, baseline):
+                self.stdout.write(f"  {name:<28} {old:9.2f} -> {new:9.2f} ms  ({ratio:.2f}x)")
+
+    def run_with_test_database(self, suite, engines):
+        # View benchmarks write Prediction rows, so they run against a
+        # throwaway database. SQLite gets a file so threads can share it.
+        old_name = connection.settings_dict["NAME"]
+        setup_test_environment()
+        with tempfile.TemporaryDirectory() as tmp:
+            if connection.vendor == "sqlite":
+                connection.settings_dict["TEST"]["NAME"] = os.path.join(tmp, "benchmark.sqlite3")
+            connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            try:
+                return suite.run(engines=engines)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                teardown_test_environment()
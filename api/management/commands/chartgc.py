@@ -0,0 +1,55 @@
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand
+from api.charts import CHART_MAX_AGE_DAYS, CHART_MAX_BYTES, CHART_MAX_FILES, collect_garbage, collect_legacy
+from api.models import Prediction
+
+
+class Command(BaseCommand):
+    help = "Remove unused charts from the chart cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-age-days", type=int, default=CHART_MAX_AGE_DAYS,
+                            help="Remove charts not served for this many days")
+        parser.add_argument("--max-bytes", type=int, default=CHART_MAX_BYTES, help="Size limit of the cache")
+        parser.add_argument("--max-files", type=int, default=CHART_MAX_FILES, help="File limit of the cache")
+        parser.add_argument("--legacy", action="store_true",
+                            help="Also remove old per-request charts under STATIC_ROOT that no prediction links to")
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be removed")
+
+    def handle(self, *args, **options):
+        verb = "Would remove" if options["dry_run"] else "Removed"
+        stats = collect_garbage(
+            options["max_age_days"], options["max_bytes"], options["max_files"], dry_run=options["dry_run"],
+        )
+        self.stdout.write(
+            f"{verb} {stats['removed']} charts ({stats['removed_bytes'] / 1e6:.1f} MB); "
+            f"{stats['files']} left ({stats['bytes'] / 1e6:.1f} MB)"
+        )
+        if options["legacy"]:
+            chart_dir = os.path.join(settings.STATIC_ROOT, "charts")
+            keep = self.legacy_references() | self.collected_files(chart_dir)
+            stats = collect_legacy(chart_dir, keep, dry_run=options["dry_run"])
+            self.stdout.write(f"{verb} {stats['removed']} legacy charts ({stats['removed_bytes'] / 1e6:.1f} MB)")
+
+    def legacy_references(self):
+        # Old rows store paths relative to the project root.
+        referenced = set()
+        rows = Prediction.objects.filter(chart1_path__startswith="staticfiles/").values_list("chart1_path", "chart2_path")
+        for paths in rows.iterator(chunk_size=2000):
+            referenced.update(os.path.abspath(os.path.join(settings.BASE_DIR, path)) for path in paths if path)
+        return referenced
+
+    def collected_files(self, chart_dir):
+        # Files collectstatic copies into STATIC_ROOT/charts from an app or
+        # STATICFILES_DIRS are assets, not generated charts.
+        collected = set()
+        for directory, _, names in os.walk(chart_dir):
+            for name in names:
+                path = os.path.join(directory, name)
+                relative = os.path.relpath(path, settings.STATIC_ROOT).replace(os.sep, "/")
+                if finders.find(relative):
+                    collected.add(os.path.abspath(path))
+        return collected
@@ -0,0 +1,37 @@
+import os
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from api.lstm import NumpyModel
+from api.model_registry import load_keras_model
+from api.predictor import MODEL_PATH, NUMPY_MODEL_PATH, WINDOW
+
+
+class Command(BaseCommand):
+    help = "Export the Keras model's weights to .npz for MODEL_ENGINE=numpy"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", default=MODEL_PATH, help="Keras model to export")
+        parser.add_argument("--output", default=NUMPY_MODEL_PATH, help="Where to write the .npz")
+        parser.add_argument("--samples", type=int, default=256, help="Random windows used to check the export")
+        parser.add_argument("--tolerance", type=float, default=1e-4,
+                            help="Largest allowed difference from the Keras output")
+
+    def handle(self, *args, **options):
+        keras_model = load_keras_model(options["model"])
+        model = NumpyModel.from_keras(keras_model)
+
+        windows = np.random.default_rng(0).random((options["samples"], WINDOW, 1)).astype(np.float32)
+        expected = keras_model.predict(windows, batch_size=len(windows), verbose=0)
+        difference = float(np.abs(model.predict(windows) - expected).max())
+        if difference > options["tolerance"]:
+            raise CommandError(f"NumPy output differs from Keras by {difference:.2e} (tolerance {options['tolerance']:.0e})")
+
+        # Written atomically; running processes reload it when it changes.
+        tmp = options["output"] + ".tmp"
+        model.save(tmp)
+        os.replace(tmp, options["output"])
+        self.stdout.write(
+            f"Wrote {options['output']} ({os.path.getsize(options['output'])} bytes); "
+            f"max difference from Keras {difference:.2e} over {len(windows)} windows"
+        )
@@ -0,0 +1,22 @@
+import json
+from django.core.management.base import BaseCommand
+from api.benchmarks import import_report, measure_imports
+
+
+class Command(BaseCommand):
+    help = "Report what importing the app costs at startup, by top-level package"
+
+    def add_arguments(self, parser):
+        parser.add_argument("modules", nargs="*", default=["core.urls"],
+                            help="Modules to import after django.setup() (default: core.urls)")
+        parser.add_argument("--top", type=int, default=15, help="Packages to list")
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+
+    def handle(self, *args, **options):
+        report = import_report(measure_imports(options["modules"]), top=options["top"])
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self.stdout.write(f"{report['modules']} modules imported in {report['total_ms']:.1f} ms")
+        for name, ms in report["packages"]:
+            self.stdout.write(f"  {name:<28} {ms:9.1f} ms")
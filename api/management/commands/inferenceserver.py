@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from api.inference import InferenceServer
+from api.predictor import INFERENCE_SOCKET, load_lstm_model, model_registry
+
+
+class Command(BaseCommand):
+    help = "Serve LSTM predictions to web workers and the bot over a Unix socket"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--socket", default=INFERENCE_SOCKET or "data/inference.sock", help="Unix socket path")
+        parser.add_argument("--batch-delay-ms", type=float, default=5.0,
+                            help="How long to gather concurrent requests into one forward pass")
+        parser.add_argument("--max-batch", type=int, default=4096, help="Most windows scored in one pass")
+
+    def handle(self, *args, **options):
+        load_lstm_model()
+        stats = model_registry.stats()
+        self.stdout.write(f"Model loaded in {stats['load_seconds']:.2f}s ({stats['weights_bytes']} weight bytes)")
+
+        # The registry reloads the model if the file changes while serving.
+        server = InferenceServer(
+            options["socket"], load_lstm_model,
+            batch_delay=options["batch_delay_ms"] / 1000, max_batch=options["max_batch"],
+        )
+        self.stdout.write(f"Inference server listening on {options['socket']}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
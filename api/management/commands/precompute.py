@@ -0,0 +1,56 @@
+import threading
+
+from django.core.management.base import BaseCommand
+from api.charts import collect_garbage
+from api.precompute import (
+    PRECOMPUTE_AT, PRECOMPUTE_BATCH, PRECOMPUTE_TOP, PRECOMPUTE_WORKERS, DailyScheduler, precompute, report,
+    watchlist,
+)
+from api.pricestore import normalize_ticker
+
+
+class Command(BaseCommand):
+    help = "Precompute next-day predictions and charts for the watchlist"
+
+    def add_arguments(self, parser):
+        parser.add_argument("tickers", nargs="*", help="Tickers to precompute (default: the watchlist)")
+        parser.add_argument("--top", type=int, default=PRECOMPUTE_TOP, help="Watchlist size")
+        parser.add_argument("--workers", type=int, default=PRECOMPUTE_WORKERS, help="Batches run in parallel")
+        parser.add_argument("--batch-size", type=int, default=PRECOMPUTE_BATCH, help="Tickers per forward pass")
+        parser.add_argument("--no-charts", action="store_true", help="Skip pre-rendering charts")
+        parser.add_argument("--daily", action="store_true", help="Keep running, once a day at --at")
+        parser.add_argument("--at", default=PRECOMPUTE_AT, help="Local time of the daily run (HH:MM)")
+        parser.add_argument("--report", type=int, metavar="DAYS",
+                            help="Print requests served from precomputed results instead of running")
+
+    def handle(self, *args, **options):
+        if options["report"]:
+            for row in report(options["report"]):
+                self.stdout.write(f"{row['day']}  {row['hits']:6d} hits  {row['seconds_saved']:9.1f}s saved")
+            return
+
+        if not options["daily"]:
+            return self.run_once(options)
+        scheduler = DailyScheduler(options["at"], lambda: self.run_once(options))
+        self.stdout.write(f"Precompute scheduled daily at {options['at']}, next run {scheduler.next_run():%Y-%m-%d %H:%M}")
+        scheduler.start()
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            scheduler.stop()
+
+    def run_once(self, options):
+        tickers = [normalize_ticker(t) for t in options["tickers"]] or watchlist(options["top"])
+        summary = precompute(
+            tickers, workers=options["workers"], batch_size=options["batch_size"], charts=not options["no_charts"],
+        )
+        self.stdout.write(
+            f"Precomputed {summary['computed']} of {summary['tickers']} tickers in {summary['seconds']:.1f}s "
+            f"({summary['fresh']} already fresh, {len(summary['errors'])} failed)"
+        )
+        for ticker, error in sorted(summary["errors"].items()):
+            self.stderr.write(f"  {ticker}: {error}")
+        if not options["no_charts"]:
+            # Tonight's charts count as used, so only stale ones go.
+            stats = collect_garbage()
+            self.stdout.write(f"Removed {stats['removed']} unused charts, {stats['files']} cached")
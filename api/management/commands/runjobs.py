@@ -0,0 +1,21 @@
+import time
+from django.core.management.base import BaseCommand
+from api.jobs import drain
+
+
+class Command(BaseCommand):
+    help = "Process queued async prediction jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds between polls")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Prediction job worker started")
+        while True:
+            processed = drain()
+            if processed:
+                self.stdout.write(f"Processed {processed} job(s)")
+            if options["once"]:
+                return
+            time.sleep(options["interval"])
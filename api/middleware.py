@@ -0,0 +1,73 @@
+import os
+import time
+import uuid
+
+from django.conf import settings
+
+from .telemetry import REQUEST_SECONDS, REQUESTS_INFLIGHT, SamplingProfiler
+
+
+class RequestMetricsMiddleware:
+    # Records per-view latency and in-flight requests for /metrics/.
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        REQUESTS_INFLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            REQUESTS_INFLIGHT.dec()
+        match = request.resolver_match
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            view=(match.url_name or match.view_name) if match else "unmatched",
+            method=request.method,
+            status=response.status_code,
+        )
+        return response
+
+
+class RequestProfileMiddleware:
+    # With PROFILE_REQUESTS on, a request sent with "X-Profile: 1" by a staff
+    # user, or with the METRICS_TOKEN bearer, is sampled and its collapsed
+    # stacks written under PROFILE_DIR. Runs after AuthenticationMiddleware
+    # so the caller is known before anything is sampled.
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if settings.PROFILE_REQUESTS and request.headers.get("X-Profile") == "1" and self._allowed(request):
+            return self._profiled(request)
+        return self.get_response(request)
+
+    @staticmethod
+    def _allowed(request):
+        token = settings.METRICS_TOKEN
+        if token and request.headers.get("Authorization") == f"Bearer {token}":
+            return True
+        if request.user.is_staff:  # Session login.
+            return True
+        # API clients authenticate with a JWT, which DRF only checks in the view.
+        from rest_framework.exceptions import AuthenticationFailed
+        from rest_framework_simplejwt.authentication import JWTAuthentication
+        from rest_framework_simplejwt.exceptions import InvalidToken
+
+        try:
+            auth = JWTAuthentication().authenticate(request)
+        except (AuthenticationFailed, InvalidToken):
+            return False
+        return auth is not None and auth[0].is_staff
+
+    def _profiled(self, request):
+        with SamplingProfiler() as profiler:
+            response = self.get_response(request)
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.folded"
+        with open(os.path.join(settings.PROFILE_DIR, name), "w") as f:
+            f.write(profiler.collapsed())
+        response["X-Profile-File"] = name
+        return response
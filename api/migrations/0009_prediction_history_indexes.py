@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:48
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Trim, Upper
+
+
+def uppercase_tickers(apps, schema_editor):
+    # Tickers were always upper-cased, but the API didn't strip them, so
+    # older rows can carry surrounding spaces. Normalized as normalize_ticker
+    # does, so the (user, ticker) index serves exact lookups.
+    Prediction = apps.get_model('api', 'Prediction')
+    normalized = Upper(Trim('ticker'))
+    Prediction.objects.exclude(ticker=normalized).update(ticker=normalized)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_dailyusage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(uppercase_tickers, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['user', 'created_at'], name='prediction_user_created'),
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['user', 'ticker', 'created_at'], name='prediction_user_ticker_created'),
+        ),
+    ]
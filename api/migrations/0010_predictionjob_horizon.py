@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_prediction_history_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='predictionjob',
+            name='horizon',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,126 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from .telemetry import track
+
+logger = logging.getLogger(__name__)
+
+
+def _rss_bytes():
+    # Current resident set size; /proc is only available on Linux.
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_keras_model(path):
+    # Lazy-load the heavy Keras/TensorFlow modules only when needed.
+    from keras.models import load_model
+
+    return load_model(path)
+
+
+class ModelRegistry:
+    # Holds one loaded model per process. The model is loaded and warmed up
+    # on first use and reloaded only when the file's content changes, so
+    # requests never pay for deserialization after the first one. `loader`
+    # turns the file into an object with a Keras-style predict().
+
+    def __init__(self, path, warmup_shape=None, loader=load_keras_model):
+        self.path = path
+        self.warmup_shape = warmup_shape
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._model = None
+        self._model_stamp = None
+        self._model_version = None
+        self._hash_stamp = None
+        self.version = None
+        self.loaded_at = None
+        self.load_seconds = None
+        self.weights_bytes = None
+        self.rss_delta_bytes = None
+        self.loads = 0
+
+    def _stamp(self):
+        if not os.path.exists(self.path):
+            raise FileNotFoundError("Model file not found: " + self.path)
+        st = os.stat(self.path)
+        return st.st_mtime_ns, st.st_size
+
+    def _refresh_version(self, stamp):
+        # Re-hash only when mtime or size moved; a touch without a content
+        # change keeps the loaded model.
+        if stamp != self._hash_stamp:
+            self.version = file_sha256(self.path)
+            self._hash_stamp = stamp
+        return self.version
+
+    def get_version(self):
+        stamp = self._stamp()
+        if stamp == self._hash_stamp:
+            return self.version
+        with self._lock:
+            return self._refresh_version(stamp)
+
+    def get(self):
+        stamp = self._stamp()
+        model = self._model
+        if model is not None and stamp == self._model_stamp:
+            return model
+        with self._lock:
+            if self._model is None or stamp != self._model_stamp:
+                version = self._refresh_version(stamp)
+                if self._model is None or version != self._model_version:
+                    self._load()
+                self._model_stamp = stamp
+            return self._model
+
+    def _load(self):
+        rss_before = _rss_bytes()
+        started = time.perf_counter()
+        with track("model_load"):
+            model = self.loader(self.path)
+            if self.warmup_shape:
+                # Build the predict function now rather than on the first request.
+                model.predict(np.zeros(self.warmup_shape), batch_size=self.warmup_shape[0], verbose=0)
+        self.load_seconds = time.perf_counter() - started
+        rss_after = _rss_bytes()
+
+        self._model = model
+        self._model_version = self.version
+        self.loads += 1
+        self.loaded_at = time.time()
+        self.weights_bytes = int(sum(w.nbytes for w in model.get_weights()))
+        self.rss_delta_bytes = rss_after - rss_before if rss_before and rss_after else None
+        logger.info(
+            "Loaded model %s (sha256 %s) in %.2fs: %d weight bytes, RSS delta %s bytes",
+            self.path, self.version[:12], self.load_seconds, self.weights_bytes, self.rss_delta_bytes,
+        )
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "version": self.version,
+            "loaded": self._model is not None,
+            "loads": self.loads,
+            "loaded_at": self.loaded_at,
+            "load_seconds": self.load_seconds,
+            "weights_bytes": self.weights_bytes,
+            "rss_delta_bytes": self.rss_delta_bytes,
+        }
@@ -1,3 +1,4 @@
+import uuid
 from django.db import models
 from django.contrib.auth.models import User
 
@@ -10,6 +11,14 @@ class Prediction(models.Model):
     chart1_path = models.CharField(max_length=255)
     chart2_path = models.CharField(max_length=255)
 
+    class Meta:
+        # History is always read per user, newest first, optionally for one
+        # ticker; tickers are stored upper-case so lookups stay exact.
+        indexes = [
+            models.Index(fields=["user", "created_at"], name="prediction_user_created"),
+            models.Index(fields=["user", "ticker", "created_at"], name="prediction_user_ticker_created"),
+        ]
+
     def __str__(self):
         return f"{self.ticker} - {self.predicted_price:.2f} on {self.created_at.date()}"
 
@@ -31,3 +40,45 @@ class Membership(models.Model):
     def __str__(self):
         return f"{self.user.username} ({'Paid' if self.is_paid else 'Free'})"
 
+
+class PredictionJob(models.Model):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    ticker = models.CharField(max_length=10)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    prediction = models.ForeignKey(Prediction, on_delete=models.SET_NULL, null=True, blank=True)
+    error = models.TextField(blank=True)
+    quota_day = models.DateField(null=True, blank=True)  # Day charged at submission; refunded on failure.
+    horizon = models.PositiveSmallIntegerField(default=1)  # Trading days to forecast.
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.ticker} job {self.id} ({self.status})"
+
+
+class DailyUsage(models.Model):
+    # Free-tier predictions used per user per day, updated by api.quota.
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    day = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "day"], name="unique_daily_usage"),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username}: {self.count} on {self.day}"
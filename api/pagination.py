@@ -0,0 +1,10 @@
+from rest_framework.pagination import CursorPagination
+
+
+class PredictionCursorPagination(CursorPagination):
+    # Keyset pagination on the (user, created_at) index: every page costs the
+    # same no matter how deep into a long history the client reads.
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    ordering = ("-created_at", "-id")
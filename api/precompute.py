@@ -0,0 +1,150 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from django.db.models import Count
+from django.utils import timezone
+
+from .charts import ChartDataMissing, chart_kinds, get_chart
+from .config import getenv, getenv_int
+from .models import Prediction
+from .predictor import BACKTEST_DAYS, WINDOW, fetch_stock_data_many, model_registry
+from .pricestore import normalize_ticker
+from .services import build_prediction, cache_key, last_bar, predict_tickers, result_store
+
+logger = logging.getLogger(__name__)
+
+PRECOMPUTE_TICKERS = [t for t in getenv("PRECOMPUTE_TICKERS", "").split(",") if t.strip()]
+PRECOMPUTE_TOP = getenv_int("PRECOMPUTE_TOP", 200)
+PRECOMPUTE_LOOKBACK_DAYS = getenv_int("PRECOMPUTE_LOOKBACK_DAYS", 30)
+PRECOMPUTE_AT = getenv("PRECOMPUTE_AT", "03:30")  # Local time (TIME_ZONE), after the US close.
+PRECOMPUTE_WORKERS = getenv_int("PRECOMPUTE_WORKERS", 2)
+PRECOMPUTE_BATCH = 50
+PRECOMPUTE_RETENTION = 7 * 86400
+
+
+def watchlist(limit=PRECOMPUTE_TOP, days=PRECOMPUTE_LOOKBACK_DAYS, configured=PRECOMPUTE_TICKERS):
+    # Configured tickers first, then the most predicted ones of the last
+    # `days` days until `limit` tickers are listed.
+    tickers = [normalize_ticker(t) for t in configured]
+    since = timezone.now() - timedelta(days=days)
+    popular = (
+        Prediction.objects.filter(created_at__gte=since)
+        .values("ticker")
+        .annotate(n=Count("id"))
+        .order_by("-n", "ticker")
+        .values_list("ticker", flat=True)[:limit]
+    )
+    return list(dict.fromkeys([*tickers, *popular]))[:max(limit, len(tickers))]
+
+
+def _render_charts(result):
+    # Charts are cached by the series they're drawn from, so rendering them
+    # for an unsaved prediction also serves every later one with that data.
+    prediction = build_prediction(None, result)
+    for kind in chart_kinds(prediction):
+        try:
+            get_chart(prediction, kind)
+        except ChartDataMissing as e:
+            logger.warning("Skipped %s chart for %s: %s", kind, result["ticker"], e)
+
+
+def _run_batch(tickers, version, charts):
+    started = time.perf_counter()
+    results, errors = predict_tickers(tickers)
+    # The batch's cost is shared evenly; chart time is measured per ticker.
+    share = (time.perf_counter() - started) / max(len(results), 1)
+    for ticker, result in results.items():
+        chart_started = time.perf_counter()
+        if charts:
+            _render_charts(result)
+        seconds = share + time.perf_counter() - chart_started
+        result_store.put(cache_key(ticker, result["last_bar"], version), result, seconds)
+    return len(results), errors
+
+
+def precompute(tickers, workers=PRECOMPUTE_WORKERS, batch_size=PRECOMPUTE_BATCH, charts=True):
+    # Stores next-day predictions (and their charts) for `tickers` in the
+    # shared result store. Tickers whose result for the latest bar and model
+    # is already stored are skipped, so running again after more bars land
+    # only computes what changed. Returns a summary of the run.
+    started = time.perf_counter()
+    version = model_registry.get_version()
+    pending, errors, fresh = [], {}, 0
+    for ticker, df in fetch_stock_data_many(tickers).items():
+        if df.empty:
+            errors[ticker] = "No data found for ticker: " + ticker
+        elif len(df) < WINDOW + BACKTEST_DAYS:
+            errors[ticker] = "Not enough price history for ticker: " + ticker
+        elif result_store.get(cache_key(ticker, last_bar(df), version)) is not None:
+            fresh += 1
+        else:
+            pending.append(ticker)
+
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    computed = 0
+    with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="precompute") as pool:
+        for done, batch_errors in pool.map(lambda batch: _run_batch(batch, version, charts), batches):
+            computed += done
+            errors.update(batch_errors)
+
+    pruned = result_store.prune(PRECOMPUTE_RETENTION)
+    return {
+        "tickers": len(tickers),
+        "computed": computed,
+        "fresh": fresh,
+        "errors": errors,
+        "pruned": pruned,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def report(days=1):
+    # Requests served from precomputed results per day, newest first, with
+    # the compute time they would otherwise have cost.
+    today = date.today()
+    rows = []
+    for offset in range(days):
+        day = today - timedelta(days=offset)
+        hits, seconds = result_store.hit_log(day)
+        rows.append({"day": day.isoformat(), "hits": hits, "seconds_saved": seconds})
+    return rows
+
+
+class DailyScheduler:
+    # Calls fn once a day at a local wall-clock time ("HH:MM" in
+    # settings.TIME_ZONE) on a daemon thread. A failed run is logged and
+    # retried the next day.
+
+    def __init__(self, at, fn):
+        hour, minute = (int(part) for part in at.split(":"))
+        if not (0 <= hour < 24 and 0 <= minute < 60):
+            raise ValueError(f"Invalid time of day: {at}")
+        self.hour, self.minute = hour, minute
+        self.fn = fn
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def next_run(self, now=None):
+        now = timezone.localtime(now)
+        run_at = now.replace(hour=self.hour, minute=self.minute, second=0, microsecond=0)
+        if run_at <= now:
+            run_at += timedelta(days=1)
+        return run_at
+
+    def _loop(self):
+        while not self._stopped.wait((self.next_run() - timezone.localtime()).total_seconds()):
+            try:
+                self.fn()
+            except Exception:
+                logger.exception("Scheduled run of %s failed", self.fn)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="daily-scheduler", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stopped.set()
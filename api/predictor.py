@@ -1,84 +1,164 @@
-import os
-import yfinance as yf
+import logging
 import numpy as np
-from datetime import datetime
-from sklearn.preprocessing import MinMaxScaler
-import matplotlib.pyplot as plt
+from numpy.lib.stride_tricks import sliding_window_view
+from datetime import datetime, timedelta
+from .config import getenv, getenv_int
+from .inference import InferenceClient
+from .lstm import NumpyModel
+from .model_registry import ModelRegistry
+from .pricestore import PriceStore, YFinanceSource, FixtureSource
+from .scaling import MinMaxScaler
+from .telemetry import Counter, Gauge, metrics, track
 
-MODEL_PATH = os.getenv("MODEL_PATH", "stock_prediction_model.keras")
+MODEL_PATH = getenv("MODEL_PATH", "stock_prediction_model.keras")
+# "numpy" runs the weights exported by `manage.py exportmodel` without
+# importing TensorFlow; "keras" loads MODEL_PATH itself.
+MODEL_ENGINE = getenv("MODEL_ENGINE", "keras")
+NUMPY_MODEL_PATH = getenv("NUMPY_MODEL_PATH", "stock_prediction_model.npz")
+NUMPY_MODEL_DTYPE = getenv("NUMPY_MODEL_DTYPE", "float32")
+PRICE_STORE_DIR = getenv("PRICE_STORE_DIR", "data/prices")
+PRICE_FIXTURE_DIR = getenv("PRICE_FIXTURE_DIR")  # Serve prices from local CSVs instead of yfinance.
+PRICE_REFRESH_SECONDS = getenv_int("PRICE_REFRESH_SECONDS", 900)
+PRICE_EMPTY_SECONDS = getenv_int("PRICE_EMPTY_SECONDS", 300)  # How long a ticker without data isn't asked for again.
+INFERENCE_SOCKET = getenv("INFERENCE_SOCKET")  # Unix socket of `manage.py inferenceserver`.
+WINDOW = 60  # Days of history fed to the LSTM per prediction.
+BACKTEST_DAYS = 60  # Days shown on the "Actual vs Predicted" chart.
+MAX_HORIZON = 30  # Longest multi-day forecast, in trading days.
+HISTORY_DAYS = 3652  # Ten years of prices; a fixed span is safe on Feb 29.
 
-def fetch_stock_data(ticker):
+logger = logging.getLogger(__name__)
+
+# One model per process, warmed up with the batch shape of one ticker's prediction.
+if MODEL_ENGINE == "numpy":
+    model_registry = ModelRegistry(
+        NUMPY_MODEL_PATH, warmup_shape=(BACKTEST_DAYS + 1, WINDOW, 1),
+        loader=lambda path: NumpyModel.load(path, dtype=NUMPY_MODEL_DTYPE),
+    )
+elif MODEL_ENGINE == "keras":
+    model_registry = ModelRegistry(MODEL_PATH, warmup_shape=(BACKTEST_DAYS + 1, WINDOW, 1))
+else:
+    raise ValueError(f"Unknown MODEL_ENGINE {MODEL_ENGINE!r}, expected 'keras' or 'numpy'")
+
+# With an inference server configured, this process only loads the model
+# itself if the server cannot be reached.
+inference_client = InferenceClient(INFERENCE_SOCKET) if INFERENCE_SOCKET else None
+
+price_store = PriceStore(
+    PRICE_STORE_DIR,
+    FixtureSource(PRICE_FIXTURE_DIR) if PRICE_FIXTURE_DIR else YFinanceSource(),
+    refresh_seconds=PRICE_REFRESH_SECONDS,
+    empty_seconds=PRICE_EMPTY_SECONDS,
+)
+
+def _model_metrics():
+    stats = model_registry.stats()
+    loads = Counter("stockinsight_model_loads_total", "Times the LSTM model was loaded in this process.")
+    loads.inc(stats["loads"])
+    loaded = Gauge("stockinsight_model_loaded", "Whether the LSTM model is loaded in this process.")
+    loaded.set(int(stats["loaded"]))
+    yield loads
+    yield loaded
+    if stats["load_seconds"] is not None:
+        seconds = Gauge("stockinsight_model_load_seconds", "Duration of the last model load and warmup.")
+        seconds.set(stats["load_seconds"])
+        yield seconds
+
+metrics.add_collector(_model_metrics)
+
+def _history_range():
     end = datetime.now()
-    start = end.replace(year=end.year - 10)
-    df = yf.download(ticker, start=start, end=end)
+    return end - timedelta(days=HISTORY_DAYS), end
+
+def fetch_stock_data(ticker):
+    start, end = _history_range()
+    with track("fetch"):
+        df = price_store.load(ticker, start, end)
     if df.empty:
         raise ValueError("No data found for ticker: " + ticker)
-    return df[["Close", "Open", "High", "Low", "Volume"]]
+    return df
+
+def fetch_stock_data_many(tickers):
+    # Stale tickers are refreshed together; empty frames mark missing data.
+    start, end = _history_range()
+    with track("fetch"):
+        return price_store.load_many(tickers, start, end)
 
 def load_lstm_model():
-    # Lazy-load the heavy Keras/TensorFlow modules only when needed.
-    from keras.models import load_model
-    if not os.path.exists(MODEL_PATH):
-        raise FileNotFoundError("Model file not found: " + MODEL_PATH)
-    return load_model(MODEL_PATH)
-
-def generate_prediction(df):
-    data = df[["Close"]].values
-    scaler = MinMaxScaler()
-    scaled_data = scaler.fit_transform(data)
-
-    # Use last 60 days for prediction input
-    X_input = scaled_data[-60:]
-    X_input = X_input.reshape(1, X_input.shape[0], 1)
-
-    model = load_lstm_model()
-    pred_scaled = model.predict(X_input)
-    pred = scaler.inverse_transform(pred_scaled)
-    return pred[0][0], scaler
-
-def create_charts(df, prediction, scaler, ticker=None):
-    date_str = datetime.now().strftime("%Y-%m-%d")
-    ticker_str = ticker.upper() if ticker else "UNKNOWN"
-
-    # Chart 1: Closing Price History
-    plt.figure(figsize=(10, 6))
-    df["Close"].plot(title=f"{ticker_str} Closing Price History", grid=True)
-    plt.xlabel("Date")
-    plt.ylabel("Price (USD)")
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    path1 = f"staticfiles/charts/{ticker_str}_{date_str}_history.png"
-    plt.savefig(path1)
-    plt.close()
-
-    # Chart 2: Actual vs Predicted (Last 60 Days)
-    actual_prices = df["Close"].values[-120:]  # Extra data for the sliding window.
-    actual_scaled = scaler.transform(actual_prices.reshape(-1, 1))
-
-    # Load the model just once for all predictions.
-    model = load_lstm_model()
-    predicted_prices = []
-
-    # Use a sliding window to predict a value for each day in the last 60 days.
-    for i in range(60):
-        input_seq = actual_scaled[i:i+60].reshape(1, 60, 1)
-        pred_scaled = model.predict(input_seq, verbose=0)
-        pred = scaler.inverse_transform(pred_scaled)[0][0]
-        predicted_prices.append(pred)
-
-    actual_last_60 = actual_prices[-60:]
-
-    plt.figure(figsize=(10, 6))
-    plt.plot(range(60), actual_last_60, label="Actual", color="blue")
-    plt.plot(range(60), predicted_prices, label="Predicted", color="orange")
-    plt.title(f"{ticker_str} - Last 60 Days: Actual vs Predicted", fontsize=14)
-    plt.xlabel("Day (0 = 60 days ago)", fontsize=12)
-    plt.ylabel("Price (USD)", fontsize=12)
-    plt.legend()
-    plt.grid(True, linestyle='--', alpha=0.5)
-    plt.tight_layout()
-    path2 = f"staticfiles/charts/{ticker_str}_{date_str}_predicted.png"
-    plt.savefig(path2)
-    plt.close()
-
-    return path1, path2
+    return model_registry.get()
+
+def forward(windows, model=None):
+    # One forward pass over a batch of windows, on the inference server when
+    # one is configured and reachable, otherwise on the local model.
+    if model is None and inference_client is not None:
+        try:
+            with track("inference"):
+                return inference_client.predict(windows)
+        except OSError as e:
+            logger.warning("Inference server unavailable, predicting in-process: %s", e)
+    if model is None:
+        model = load_lstm_model()
+    with track("inference"):
+        return model.predict(windows, batch_size=len(windows), verbose=0)
+
+def parse_horizon(value):
+    # Forecast length from user input (API field, form value or bot argument).
+    try:
+        horizon = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("Horizon must be a whole number of days")
+    if not 1 <= horizon <= MAX_HORIZON:
+        raise ValueError(f"Horizon must be between 1 and {MAX_HORIZON} days")
+    return horizon
+
+def roll_forward(windows, first_step, horizon):
+    # Autoregressive forecast from (k, WINDOW) scaled windows whose next
+    # step is already known: each prediction is appended to the window and
+    # the shifted window scored again, one forward pass over all k series
+    # per step. Returns the (k, horizon) scaled path.
+    path = np.empty((len(windows), WINDOW + horizon))
+    path[:, :WINDOW] = windows
+    path[:, WINDOW] = first_step
+    for step in range(1, horizon):
+        path[:, WINDOW + step] = forward(path[:, step:step + WINDOW, np.newaxis]).ravel()
+    return path[:, WINDOW:]
+
+def generate_predictions(frames, horizon=1):
+    # The prediction pipeline, for one or several tickers: one scaler column
+    # per ticker fitted in a single NumPy pass, and all of their windows
+    # scored in a single forward pass, plus one more pass per extra forecast
+    # day. The last BACKTEST_DAYS windows feed the backtest chart and the
+    # final one (the last 60 days) is the next-day input.
+    # Returns [(next_price, scaler, backtest, forecast)], where forecast holds
+    # `horizon` prices starting with next_price.
+    if not 1 <= horizon <= MAX_HORIZON:
+        raise ValueError(f"Horizon must be between 1 and {MAX_HORIZON} days")
+    span = WINDOW + BACKTEST_DAYS
+    closes = [np.asarray(df["Close"].values, dtype=np.float64).ravel() for df in frames]
+    if any(len(c) < span for c in closes):
+        raise ValueError(f"At least {span} daily bars are required")
+
+    scaler = MinMaxScaler.from_series(closes)
+    scaled = scaler.transform(np.stack([c[-span:] for c in closes], axis=1))
+    windows = sliding_window_view(scaled.T, WINDOW, axis=1).reshape(-1, WINDOW, 1)
+
+    pred_scaled = forward(windows).reshape(len(closes), -1)
+    preds = scaler.inverse_transform(pred_scaled.T).T
+    # Steps keep the model's dtype so the first one inverts to exactly next_price.
+    steps = roll_forward(scaled[-WINDOW:].T, pred_scaled[:, -1], horizon).astype(pred_scaled.dtype)
+    forecast = scaler.inverse_transform(steps.T).T
+    return [(row[-1], scaler.column(i), row[:-1], forecast[i]) for i, row in enumerate(preds)]
+
+def backtest_metrics(actual, predicted):
+    actual = np.asarray(actual, dtype=np.float64)
+    predicted = np.asarray(predicted, dtype=np.float64)
+    error = predicted - actual
+    nonzero = actual != 0
+    # A direction hit is when the prediction moves the same way from the
+    # previous actual close as the real price did.
+    hits = np.sign(predicted[1:] - actual[:-1]) == np.sign(np.diff(actual))
+    return {
+        "mae": float(np.mean(np.abs(error))),
+        "rmse": float(np.sqrt(np.mean(error ** 2))),
+        "mape": float(np.mean(np.abs(error[nonzero] / actual[nonzero])) * 100) if nonzero.any() else None,
+        "directional_accuracy": float(np.mean(hits) * 100) if len(hits) else None,
+    }
@@ -0,0 +1,217 @@
+import abc
+import logging
+import os
+import re
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ["Close", "Open", "High", "Low", "Volume"]
+TICKER_RE = re.compile(r"[A-Z0-9.^=\-]{1,10}")  # Prediction.ticker is max_length=10.
+EPOCH = np.datetime64("1970-01-01", "D")
+
+
+def day_to_datetime(day):
+    return (EPOCH + np.timedelta64(int(day), "D")).astype(datetime)
+
+
+def empty_frame():
+    # pandas is imported on first use so importing this module stays cheap.
+    import pandas as pd
+
+    return pd.DataFrame(columns=COLUMNS)
+
+
+def normalize_ticker(ticker):
+    ticker = ticker.strip().upper()
+    if not TICKER_RE.fullmatch(ticker):
+        raise ValueError("Invalid ticker: " + ticker)
+    return ticker
+
+
+class DataSource(abc.ABC):
+    # Returns daily bars for [start, end) as a DataFrame indexed by date with
+    # COLUMNS, or an empty DataFrame when the ticker has no data.
+    @abc.abstractmethod
+    def fetch(self, ticker, start, end):
+        ...
+
+    def fetch_many(self, tickers, start, end):
+        # Sources that support multi-ticker requests override this.
+        return {ticker: self.fetch(ticker, start, end) for ticker in tickers}
+
+
+class YFinanceSource(DataSource):
+    def fetch(self, ticker, start, end):
+        import pandas as pd
+        import yfinance as yf
+
+        df = yf.download(ticker, start=start, end=end, progress=False)
+        if df.empty:
+            return df
+        if isinstance(df.columns, pd.MultiIndex):
+            df.columns = df.columns.get_level_values(0)
+        return df[COLUMNS].dropna(subset=["Close"])
+
+    def fetch_many(self, tickers, start, end):
+        if len(tickers) == 1:
+            return {tickers[0]: self.fetch(tickers[0], start, end)}
+
+        import yfinance as yf
+
+        df = yf.download(tickers, start=start, end=end, group_by="ticker", progress=False)
+        frames = {}
+        for ticker in tickers:
+            if df.empty or ticker not in df.columns.get_level_values(0):
+                frames[ticker] = empty_frame()
+            else:
+                frames[ticker] = df[ticker][COLUMNS].dropna(subset=["Close"])
+        return frames
+
+
+class FixtureSource(DataSource):
+    # Offline source reading <directory>/<TICKER>.csv files with a Date column
+    # followed by COLUMNS, used by tests and benchmarks.
+    def __init__(self, directory):
+        self.directory = directory
+
+    def fetch(self, ticker, start, end):
+        import pandas as pd
+
+        path = os.path.join(self.directory, f"{ticker}.csv")
+        if not os.path.exists(path):
+            return empty_frame()
+        df = pd.read_csv(path, index_col="Date", parse_dates=True)
+        return df.loc[(df.index >= pd.Timestamp(start).normalize()) & (df.index < pd.Timestamp(end))][COLUMNS]
+
+
+class PriceStore:
+    # Append-only per-ticker store of daily bars. Each ticker is one .npy file
+    # holding an (n, 6) float64 array: days since epoch followed by COLUMNS.
+    # Files are replaced atomically and read memory-mapped, so concurrent
+    # workers share the same page cache instead of each keeping a copy. A
+    # ticker the source has no data for (unknown, delisted) is stored as an
+    # empty array, which is only trusted for empty_seconds.
+
+    def __init__(self, root, source, refresh_seconds=900, empty_seconds=300):
+        self.root = root
+        self.source = source
+        self.refresh_seconds = refresh_seconds
+        self.empty_seconds = empty_seconds
+
+    def path(self, ticker):
+        return os.path.join(self.root, f"{ticker}.npy")
+
+    def read(self, ticker):
+        try:
+            return np.load(self.path(ticker), mmap_mode="r")
+        except FileNotFoundError:
+            return None
+
+    def _is_fresh(self, ticker):
+        try:
+            age = time.time() - os.path.getmtime(self.path(ticker))
+        except OSError:
+            return False
+        stored = self.read(ticker)
+        if stored is None:
+            return False
+        return age < (self.refresh_seconds if len(stored) else min(self.empty_seconds, self.refresh_seconds))
+
+    def _write(self, ticker, data):
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=f".{ticker}.", suffix=".npy")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, data)
+            os.replace(tmp, self.path(ticker))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    @staticmethod
+    def _to_array(df):
+        days = (df.index.values.astype("datetime64[D]") - EPOCH).astype(np.float64)
+        return np.column_stack([days, df[COLUMNS].to_numpy(dtype=np.float64)])
+
+    @staticmethod
+    def _fetch_start(stored, start):
+        if stored is None or len(stored) < 2:
+            return start
+        # Re-fetch from the second to last stored bar: the last bar may have
+        # been an intraday snapshot and gets replaced, while the one before it
+        # must still match or the history was re-adjusted (split/dividend).
+        return day_to_datetime(stored[-2, 0])
+
+    def _merge(self, ticker, stored, fetched, end):
+        if stored is None or len(stored) < 2:
+            if not fetched.empty:
+                self._write(ticker, self._to_array(fetched))
+            elif stored is None or not len(stored):
+                self._write(ticker, np.empty((0, len(COLUMNS) + 1)))
+            return
+        if fetched.empty:
+            os.utime(self.path(ticker))
+            return
+
+        # Only prices are compared; volume on recent bars gets revised.
+        overlap_day = stored[-2, 0]
+        delta = self._to_array(fetched)
+        if delta[0, 0] != overlap_day or not np.allclose(delta[0, 1:5], stored[-2, 1:5], rtol=1e-6):
+            logger.info("Stored history for %s was re-adjusted upstream, refetching", ticker)
+            fetched = self.source.fetch(ticker, day_to_datetime(stored[0, 0]), end)
+            self._write(ticker, self._to_array(fetched))
+            return
+
+        self._write(ticker, np.concatenate([stored[:-2], delta]))
+        logger.debug("Refreshed %s from %s with %d bars", ticker, day_to_datetime(overlap_day), len(delta))
+
+    def update(self, ticker, start, end):
+        stored = self.read(ticker)
+        fetched = self.source.fetch(ticker, self._fetch_start(stored, start), end)
+        self._merge(ticker, stored, fetched, end)
+
+    def update_many(self, tickers, start, end):
+        # Tickers that need bars from the same date share one download.
+        stored = {ticker: self.read(ticker) for ticker in tickers}
+        groups = defaultdict(list)
+        for ticker in tickers:
+            groups[self._fetch_start(stored[ticker], start)].append(ticker)
+        for fetch_start, group in groups.items():
+            fetched = self.source.fetch_many(group, fetch_start, end)
+            for ticker in group:
+                self._merge(ticker, stored[ticker], fetched[ticker] if ticker in fetched else empty_frame(), end)
+
+    def frame(self, ticker, start, end=None):
+        # Stored bars in [start, end) without touching the data source.
+        import pandas as pd
+
+        stored = self.read(ticker)
+        if stored is None:
+            return empty_frame()
+
+        days = stored[:, 0]
+        offset = int(np.searchsorted(days, (np.datetime64(start, "D") - EPOCH).astype(np.float64)))
+        stop = len(days) if end is None else int(np.searchsorted(days, (np.datetime64(end, "D") - EPOCH).astype(np.float64)))
+        window = stored[offset:stop]
+        index = pd.DatetimeIndex(EPOCH + window[:, 0].astype("timedelta64[D]"), name="Date")
+        # copy=False keeps the frame backed by the memory-mapped file.
+        return pd.DataFrame(window[:, 1:], index=index, columns=COLUMNS, copy=False)
+
+    def load(self, ticker, start, end):
+        ticker = normalize_ticker(ticker)
+        if not self._is_fresh(ticker):
+            self.update(ticker, start, end)
+        return self.frame(ticker, start)
+
+    def load_many(self, tickers, start, end):
+        tickers = [normalize_ticker(ticker) for ticker in tickers]
+        stale = [ticker for ticker in tickers if not self._is_fresh(ticker)]
+        if stale:
+            self.update_many(stale, start, end)
+        return {ticker: self.frame(ticker, start) for ticker in tickers}
@@ -0,0 +1,86 @@
+from contextlib import contextmanager
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import ResultCache
+from .config import getenv_int
+from .models import DailyUsage, Membership, TelegramUser
+from .telemetry import track
+
+FREE_DAILY_LIMIT = 5
+PAID_STATUS_TTL = getenv_int("PAID_STATUS_TTL", 60)
+
+# Paid status rarely changes; payment views clear the entry directly and
+# other processes pick the change up within PAID_STATUS_TTL seconds.
+paid_status_cache = ResultCache(max_entries=4096, ttl=PAID_STATUS_TTL)
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, remaining):
+        super().__init__(f"Free tier daily limit ({FREE_DAILY_LIMIT} predictions) reached")
+        self.remaining = remaining
+
+
+def is_paid(user, channel="web"):
+    # Web and API users pay through Membership, Telegram users through
+    # TelegramUser; both share the same daily usage counter.
+    key = (user.pk, channel)
+    paid = paid_status_cache.get(key)
+    if paid is None:
+        model = TelegramUser if channel == "telegram" else Membership
+        paid = model.objects.filter(user=user, is_paid=True).exists()
+        paid_status_cache.set(key, paid)
+    return paid
+
+
+def forget_paid_status(user):
+    paid_status_cache.invalidate(lambda key: key[0] == user.pk)
+
+
+def _increment(user, day, n):
+    return DailyUsage.objects.filter(user=user, day=day, count__lte=FREE_DAILY_LIMIT - n).update(count=F("count") + n)
+
+
+def reserve(user, n=1, channel="web"):
+    # Takes n predictions from today's allowance with a single conditional
+    # UPDATE, so concurrent requests can never overshoot the limit. Returns
+    # the day charged (None for paid users) for refund().
+    if is_paid(user, channel):
+        return None
+    day = timezone.localdate()
+    with track("quota"):
+        if _increment(user, day, n):
+            return day
+        if n <= FREE_DAILY_LIMIT and not DailyUsage.objects.filter(user=user, day=day).exists():
+            try:
+                with transaction.atomic():
+                    DailyUsage.objects.create(user=user, day=day, count=n)
+                return day
+            except IntegrityError:
+                # Another request created today's row first.
+                if _increment(user, day, n):
+                    return day
+    raise QuotaExceeded(remaining(user))
+
+
+def refund(user, day, n=1):
+    if day is not None and n:
+        DailyUsage.objects.filter(user=user, day=day, count__gte=n).update(count=F("count") - n)
+
+
+def remaining(user):
+    used = DailyUsage.objects.filter(user=user, day=timezone.localdate()).values_list("count", flat=True).first()
+    return max(FREE_DAILY_LIMIT - (used or 0), 0)
+
+
+@contextmanager
+def consume(user, n=1, channel="web"):
+    # Reserve before running a prediction and give the allowance back if it fails.
+    day = reserve(user, n, channel)
+    try:
+        yield day
+    except BaseException:
+        refund(user, day, n)
+        raise
@@ -0,0 +1,90 @@
+import numpy as np
+
+# sklearn treats ranges below this as constant features and scales them by 1.
+_EPS = 10 * np.finfo(np.float64).eps
+
+
+class MinMaxScaler:
+    # NumPy version of sklearn's MinMaxScaler (feature_range=(0, 1)) using
+    # the same arithmetic, so scaled values and predictions are bit-for-bit
+    # identical, without sklearn's import and per-call validation cost. Only
+    # (min, max) per column is kept, which makes it cheap to extend with new
+    # bars (partial_fit) and to store alongside a cached prediction.
+
+    def __init__(self, data_min=None, data_max=None, n_samples_seen=0):
+        self.data_min_ = None if data_min is None else np.asarray(data_min, dtype=np.float64)
+        self.data_max_ = None if data_max is None else np.asarray(data_max, dtype=np.float64)
+        self.n_samples_seen_ = n_samples_seen
+        if self.data_min_ is not None:
+            self._update_scale()
+
+    @classmethod
+    def from_series(cls, series):
+        # One column per 1-D series, fitted in a single reduceat pass over
+        # all of them; series may have different lengths.
+        lengths = np.array([len(s) for s in series])
+        offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        flat = np.concatenate([np.asarray(s, dtype=np.float64).ravel() for s in series])
+        return cls(np.minimum.reduceat(flat, offsets), np.maximum.reduceat(flat, offsets), lengths)
+
+    def _update_scale(self):
+        self.data_range_ = self.data_max_ - self.data_min_
+        self.scale_ = 1.0 / np.where(self.data_range_ < _EPS, 1.0, self.data_range_)
+        self.min_ = 0.0 - self.data_min_ * self.scale_
+
+    @staticmethod
+    def _as_2d(X):
+        X = np.asarray(X, dtype=np.float64)
+        return X.reshape(-1, 1) if X.ndim == 1 else X
+
+    def partial_fit(self, X):
+        X = self._as_2d(X)
+        data_min, data_max = np.nanmin(X, axis=0), np.nanmax(X, axis=0)
+        if self.data_min_ is not None:
+            data_min = np.minimum(self.data_min_, data_min)
+            data_max = np.maximum(self.data_max_, data_max)
+        self.data_min_, self.data_max_ = data_min, data_max
+        self.n_samples_seen_ += len(X)
+        self._update_scale()
+        return self
+
+    def fit(self, X):
+        self.data_min_ = self.data_max_ = None
+        self.n_samples_seen_ = 0
+        return self.partial_fit(X)
+
+    def fit_transform(self, X):
+        return self.fit(X).transform(X)
+
+    @staticmethod
+    def _copy(X):
+        # Like sklearn, float32 input (e.g. model output) stays float32.
+        X = np.asarray(X)
+        return np.array(X, dtype=X.dtype if X.dtype in (np.float32, np.float64) else np.float64)
+
+    def transform(self, X):
+        X = self._copy(X)
+        X *= self.scale_
+        X += self.min_
+        return X
+
+    def inverse_transform(self, X):
+        X = self._copy(X)
+        X -= self.min_
+        X /= self.scale_
+        return X
+
+    def column(self, i):
+        seen = self.n_samples_seen_
+        return MinMaxScaler(self.data_min_[i:i + 1], self.data_max_[i:i + 1], int(seen[i] if np.ndim(seen) else seen))
+
+    def to_dict(self):
+        return {
+            "data_min": self.data_min_.tolist(),
+            "data_max": self.data_max_.tolist(),
+            "n_samples_seen": np.asarray(self.n_samples_seen_).tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["data_min"], data["data_max"], data["n_samples_seen"])
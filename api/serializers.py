@@ -1,6 +1,7 @@
 from django.contrib.auth.models import User
 from rest_framework import serializers
-from .models import Prediction
+from .charts import plot_urls
+from .models import Prediction, PredictionJob
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
@@ -14,6 +15,41 @@ class RegisterSerializer(serializers.ModelSerializer):
         return user
 
 class PredictionSerializer(serializers.ModelSerializer):
+    # `fields` limits the output to the named fields; the stored backtest
+    # and history series are left out of `metrics` unless `include_backtest`
+    # is set.
+    def __init__(self, *args, fields=None, include_backtest=True, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.include_backtest = include_backtest
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     class Meta:
         model = Prediction
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if not self.include_backtest and isinstance(data.get('metrics'), dict):
+            data['metrics'] = {k: v for k, v in data['metrics'].items() if k not in ('backtest', 'history')}
+        return data
+
+class PredictionJobSerializer(serializers.ModelSerializer):
+    job_id = serializers.UUIDField(source='id', read_only=True)
+    result = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PredictionJob
+        fields = ('job_id', 'ticker', 'horizon', 'status', 'error', 'created_at', 'started_at', 'finished_at', 'result')
+
+    def get_result(self, job):
+        prediction = job.prediction
+        if prediction is None:
+            return None
+        return {
+            "ticker": prediction.ticker,
+            "next_day_price": prediction.predicted_price,
+            "forecast": prediction.metrics.get("forecast", [prediction.predicted_price]),
+            "plot_urls": plot_urls(prediction),
+        }
@@ -0,0 +1,249 @@
+import atexit
+import time
+from datetime import date
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+
+from .cache import ResultCache, ResultStore
+from .db import WriteBuffer
+from .charts import chart_path, render_backtest, save_history
+from .config import getenv, getenv_float, getenv_int
+from .models import Prediction
+from .predictor import (
+    BACKTEST_DAYS, WINDOW, backtest_metrics, fetch_stock_data, fetch_stock_data_many, generate_predictions,
+    inference_client, load_lstm_model, model_registry,
+)
+from .pricestore import empty_frame, normalize_ticker
+from .singleflight import SingleFlight
+from .telemetry import Counter, Gauge, metrics
+
+COALESCE_DIR = getenv("COALESCE_DIR", "data/locks")
+PREDICTION_CACHE_SIZE = getenv_int("PREDICTION_CACHE_SIZE", 512)
+PREDICTION_CACHE_TTL = getenv_int("PREDICTION_CACHE_TTL", 86400)
+PRECOMPUTE_DIR = getenv("PRECOMPUTE_DIR", "data/precomputed")
+HISTORY_BUFFER_SIZE = getenv_int("HISTORY_BUFFER_SIZE", 50)
+HISTORY_FLUSH_SECONDS = getenv_float("HISTORY_FLUSH_SECONDS", 2)
+HISTORY_CACHE_TTL = getenv_int("HISTORY_CACHE_TTL", 3600)
+
+prediction_flight = SingleFlight(COALESCE_DIR)
+prediction_cache = ResultCache(max_entries=PREDICTION_CACHE_SIZE, ttl=PREDICTION_CACHE_TTL)
+# Filled overnight by `manage.py precompute` (see api.precompute).
+result_store = ResultStore(PRECOMPUTE_DIR)
+
+
+def _cache_metrics():
+    stats = prediction_cache.stats()
+    for field in ("hits", "misses", "evictions", "expirations"):
+        counter = Counter(f"stockinsight_prediction_cache_{field}_total", f"Prediction cache {field}.")
+        counter.inc(stats[field])
+        yield counter
+    size = Gauge("stockinsight_prediction_cache_entries", "Entries held in the prediction cache.")
+    size.set(stats["size"])
+    yield size
+    hits = Counter("stockinsight_precomputed_hits_total", "Predictions served from precomputed results.")
+    hits.inc(result_store.hits)
+    yield hits
+    saved = Counter("stockinsight_precomputed_seconds_saved_total", "Compute time saved by precomputed results.")
+    saved.inc(result_store.seconds_saved)
+    yield saved
+
+
+metrics.add_collector(_cache_metrics)
+
+
+SERIES_DECIMALS = 4
+
+
+def _build_result(ticker, df, next_price, scaler, backtest, forecast):
+    # Charts are rendered on demand from these series (see api.charts); the
+    # daily closes for the history chart are stored on their own and
+    # "history" is their reference. The scaler's (min, max) is kept so the
+    # result can be extended or re-scored without refitting the full history.
+    actual = np.asarray(df["Close"].values[-len(backtest):], dtype=np.float64)
+    return {
+        "ticker": ticker,
+        "next_day_price": float(next_price),
+        "last_bar": last_bar(df),
+        "actual": np.round(actual, SERIES_DECIMALS).tolist(),
+        "backtest": np.round(np.asarray(backtest, dtype=np.float64), SERIES_DECIMALS).tolist(),
+        "metrics": backtest_metrics(actual, backtest),
+        "scaler": scaler.to_dict(),
+        "forecast": np.round(np.asarray(forecast, dtype=np.float64), SERIES_DECIMALS).tolist(),
+        "history": save_history(
+            df.index.strftime("%Y-%m-%d").tolist(),
+            np.round(np.asarray(df["Close"].values, dtype=np.float64), SERIES_DECIMALS).tolist(),
+        ),
+    }
+
+
+def run_pipeline(ticker, df, horizon=1):
+    return _build_result(ticker, df, *generate_predictions([df], horizon)[0])
+
+
+def last_bar(df):
+    return df.index[-1].strftime("%Y-%m-%d")
+
+
+def cache_key(ticker, bar, version, horizon=1):
+    # The prediction only changes with a new daily bar or a new model, so
+    # both are part of the cache key.
+    return (ticker, bar, version, horizon)
+
+
+def _cache_get(key):
+    # In-process cache first, then results precomputed by another process.
+    result = prediction_cache.get(key)
+    if result is None:
+        entry = result_store.get(key)
+        if entry is not None:
+            result = entry["result"]
+            prediction_cache.set(key, result)
+            result_store.record_hit(entry)
+    return result
+
+
+def _cache_set(key, result):
+    # Drops this ticker's results for older bars or models; other horizons
+    # for the same bar stay cached.
+    prediction_cache.invalidate(lambda k: k[0] == key[0] and k[1:3] != key[1:3])
+    prediction_cache.set(key, result)
+
+
+def _predict_cached(ticker, version, horizon):
+    df = fetch_stock_data(ticker)
+    key = cache_key(ticker, last_bar(df), version, horizon)
+    result = _cache_get(key)
+    if result is None:
+        result = run_pipeline(ticker, df, horizon)
+        _cache_set(key, result)
+    return result
+
+
+def predict_ticker(ticker, horizon=1):
+    # Concurrent requests for the same ticker, horizon, day and model share
+    # one run. Callers still record their own Prediction row and quota usage.
+    ticker = normalize_ticker(ticker)
+    version = model_registry.get_version()
+    key = (ticker, date.today().isoformat(), version, horizon)
+    return prediction_flight.do(key, lambda: _predict_cached(ticker, version, horizon))
+
+
+def predict_tickers(tickers, horizon=1):
+    # Batch counterpart of predict_ticker for already-normalized tickers.
+    # Returns ({ticker: result}, {ticker: error message}); cached tickers are
+    # served as-is and the rest share one download and one forward pass per
+    # forecast day.
+    version = model_registry.get_version()
+    results, errors, pending = {}, {}, {}
+    for ticker, df in fetch_stock_data_many(tickers).items():
+        if df.empty:
+            errors[ticker] = "No data found for ticker: " + ticker
+        elif len(df) < WINDOW + BACKTEST_DAYS:
+            errors[ticker] = "Not enough price history for ticker: " + ticker
+        else:
+            key = cache_key(ticker, last_bar(df), version, horizon)
+            results[ticker] = _cache_get(key)
+            if results[ticker] is None:
+                pending[ticker] = (key, df)
+
+    if pending:
+        outputs = generate_predictions([df for _, df in pending.values()], horizon)
+        for (ticker, (key, df)), output in zip(pending.items(), outputs):
+            results[ticker] = _build_result(ticker, df, *output)
+            _cache_set(key, results[ticker])
+    return results, errors
+
+
+def build_prediction(user, result):
+    metrics = {
+        "last_bar": result["last_bar"],
+        **result["metrics"],
+        "backtest": {"actual": result["actual"], "predicted": result["backtest"]},
+    }
+    if len(result.get("forecast", ())) > 1:
+        metrics["forecast"] = result["forecast"]
+    if "history" in result:
+        metrics["history"] = result["history"]
+    return Prediction(
+        user=user,
+        ticker=result["ticker"],
+        predicted_price=round(result["next_day_price"], 2),
+        metrics=metrics,
+    )
+
+
+def _set_chart_paths(prediction):
+    # Chart URLs embed the row id, so they are filled in once it exists.
+    prediction.chart1_path = chart_path(prediction.pk, "history")
+    prediction.chart2_path = chart_path(prediction.pk, "predicted")
+
+
+def _history_version_key(user_id):
+    return f"history-version:{user_id}"
+
+
+def history_cache_key(user_id, before):
+    # Rendered dashboard history lives in Django's cache, which every
+    # process shares (settings.CACHES). Keys carry a per-user version, so
+    # bumping it retires all of the user's cached pages at once. Versions
+    # come from the clock: one evicted from the cache never comes back
+    # with a value that matches older pages.
+    version = cache.get_or_set(_history_version_key(user_id), time.time_ns, timeout=None)
+    return f"history:{user_id}:{version}:{before or 0}"
+
+
+def _forget_history(user_ids):
+    # Bumped once the rows are committed: a render that runs before then
+    # can't see them, and must not be cached under the new version.
+    def bump():
+        cache.set_many({_history_version_key(user_id): time.time_ns() for user_id in user_ids}, timeout=None)
+    transaction.on_commit(bump)
+
+
+def record_prediction(user, result):
+    prediction = build_prediction(user, result)
+    prediction.save()
+    _set_chart_paths(prediction)
+    prediction.save(update_fields=["chart1_path", "chart2_path"])
+    _forget_history({prediction.user_id})
+    return prediction
+
+
+def save_predictions(predictions):
+    predictions = Prediction.objects.bulk_create(predictions)
+    for prediction in predictions:
+        _set_chart_paths(prediction)
+    Prediction.objects.bulk_update(predictions, ["chart1_path", "chart2_path"])
+    _forget_history({prediction.user_id for prediction in predictions})
+    return predictions
+
+
+def record_predictions(user, results):
+    return save_predictions([build_prediction(user, result) for result in results])
+
+
+# History rows whose id nobody needs right away (the bot sends its charts
+# inline) are written in batches; see buffer_prediction.
+history_buffer = WriteBuffer(save_predictions, HISTORY_BUFFER_SIZE, HISTORY_FLUSH_SECONDS)
+atexit.register(history_buffer.flush)
+
+
+def buffer_prediction(user, result):
+    # Like record_prediction, but the row is saved later together with
+    # others, so the returned Prediction has no id yet.
+    prediction = build_prediction(user, result)
+    history_buffer.add(prediction)
+    return prediction
+
+
+def warmup():
+    # Pays the deferred import and load costs up front (gunicorn runs this
+    # in each worker when WARMUP_ON_FORK is set) instead of on the first
+    # request: pandas, matplotlib and, unless an inference server
+    # owns it, the model.
+    empty_frame()
+    render_backtest("WARMUP", [0.0, 1.0], [0.0, 1.0])
+    if inference_client is None:
+        load_lstm_model()
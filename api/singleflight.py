@@ -0,0 +1,127 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; coalesce within the process only.
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    # Runs at most one computation per key at a time. Threads in the same
+    # process wait on the leader's in-memory result; other processes serialize
+    # on a file lock and pick up the JSON result the leader wrote while they
+    # were waiting.
+
+    def __init__(self, lock_dir, prune_seconds=86400):
+        self.lock_dir = lock_dir
+        self.prune_seconds = prune_seconds
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run_exclusive(key, fn)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def _run_exclusive(self, key, fn):
+        if fcntl is None:
+            return fn()
+
+        os.makedirs(self.lock_dir, exist_ok=True)
+        name = hashlib.sha1(json.dumps(key).encode()).hexdigest()
+        lock_path = os.path.join(self.lock_dir, name + ".lock")
+        result_path = os.path.join(self.lock_dir, name + ".json")
+
+        waiting_since = time.time()
+        with self._acquire(lock_path) as lock_file:
+            try:
+                shared = self._read_result(result_path)
+                if shared is not None and shared["finished_at"] >= waiting_since:
+                    logger.debug("Reused result of %s computed by another process", key)
+                    return shared["result"]
+
+                result = fn()
+                self._write_result(result_path, result)
+                return result
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _acquire(lock_path):
+        # Returns the open lock file, locked. _prune may unlink a lock file
+        # while another process waits on it, so the lock only counts if the
+        # path still names the file that was locked.
+        while True:
+            lock_file = open(lock_path, "a")
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if os.stat(lock_path).st_ino == os.fstat(lock_file.fileno()).st_ino:
+                    return lock_file
+            except FileNotFoundError:
+                pass
+            lock_file.close()
+
+    @staticmethod
+    def _read_result(path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_result(self, path, result):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"finished_at": time.time(), "result": result}, f)
+        os.replace(tmp, path)
+        self._prune()
+
+    def _prune(self):
+        # Keys embed the trading day, so files from previous days are unused.
+        # A lock file is only removed while no one holds it.
+        cutoff = time.time() - self.prune_seconds
+        for entry in os.scandir(self.lock_dir):
+            try:
+                if entry.stat().st_mtime >= cutoff:
+                    continue
+                if not entry.name.endswith(".lock"):
+                    os.unlink(entry.path)
+                    continue
+                with open(entry.path, "a") as lock_file:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    os.unlink(entry.path)
+            except OSError:  # Includes BlockingIOError: the lock is held.
+                pass
@@ -1,3 +1,1549 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import importlib
+import importlib.util
+import io
+import json
+import mmap
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache as django_cache
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from telegram.request import BaseRequest
+
+from . import benchmarks, bot, botqueue, charts, db, inference, jobs, precompute, predictor, quota, services, singleflight, telemetry, views
+from .cache import ResultCache, ResultStore
+from .config import getenv, getenv_bool, getenv_int
+from .lstm import NumpyModel
+from .model_registry import ModelRegistry, file_sha256
+from .models import DailyUsage, Membership, Prediction, PredictionJob, TelegramUser
+from .pricestore import DataSource, FixtureSource, PriceStore
+from .scaling import MinMaxScaler
+from .singleflight import SingleFlight
+from .webhook import TelegramWebhook
+
+# Every test gets an in-memory Django cache instead of the shared file
+# cache under data/cache.
+test_cache = override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+
+
+def setUpModule():
+    test_cache.enable()
+
+
+def tearDownModule():
+    test_cache.disable()
+
+
+HAS_KERAS = importlib.util.find_spec("keras") is not None
+HAS_SKLEARN = importlib.util.find_spec("sklearn") is not None
+
+
+def make_price_frame(days=300, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, days))
+    index = pd.bdate_range("2024-01-01", periods=days)
+    return pd.DataFrame({
+        "Close": close,
+        "Open": close,
+        "High": close + 1,
+        "Low": close - 1,
+        "Volume": rng.integers(1_000, 10_000, days).astype(float),
+    }, index=index)
+
+
+class Float32Model:
+    # Deterministic stand-in for the LSTM that, like Keras, returns float32.
+    def predict(self, windows, batch_size=None, verbose=0):
+        return (windows.mean(axis=(1, 2)) * 0.9 + 0.05).astype(np.float32).reshape(-1, 1)
+
+
+class MinMaxScalerTests(SimpleTestCase):
+    def setUp(self):
+        self.closes = make_price_frame()[["Close"]].values
+
+    @unittest.skipUnless(HAS_SKLEARN, "scikit-learn is not installed")
+    def test_matches_sklearn_bit_for_bit(self):
+        from sklearn.preprocessing import MinMaxScaler as SklearnScaler
+
+        for data in [self.closes, np.full((10, 1), 7.0), np.array([[1.0, 5.0], [3.0, 5.0], [2.0, 9.0]])]:
+            ours, theirs = MinMaxScaler().fit(data), SklearnScaler().fit(data)
+            np.testing.assert_array_equal(ours.transform(data), theirs.transform(data))
+            preds = (ours.transform(data) * 0.5).astype(np.float32)
+            ours_inverse, theirs_inverse = ours.inverse_transform(preds), theirs.inverse_transform(preds)
+            self.assertEqual(ours_inverse.dtype, theirs_inverse.dtype)
+            np.testing.assert_array_equal(ours_inverse, theirs_inverse)
+
+    @unittest.skipUnless(HAS_SKLEARN, "scikit-learn is not installed")
+    def test_generate_prediction_output_is_unchanged(self):
+        from sklearn.preprocessing import MinMaxScaler as SklearnScaler
+
+        df = make_price_frame()
+        model = Float32Model()
+        reference = SklearnScaler().fit(df[["Close"]].values)
+        windows = sliding_window_view(reference.transform(df[["Close"]].values)[-120:].ravel(), 60)[:, :, np.newaxis]
+        expected = reference.inverse_transform(model.predict(windows).reshape(-1, 1)).ravel()
+
+        with mock.patch.object(predictor, "inference_client", None), \
+                mock.patch.object(predictor, "load_lstm_model", return_value=model):
+            batched = predictor.generate_predictions([df, df * 2])
+        self.assertEqual(batched[0][0], expected[-1])
+        np.testing.assert_array_equal(batched[0][2], expected[:-1])
+
+    def test_partial_fit_extends_without_refitting(self):
+        incremental = MinMaxScaler().fit(self.closes[:200]).partial_fit(self.closes[200:])
+        full = MinMaxScaler().fit(self.closes)
+        np.testing.assert_array_equal(incremental.transform(self.closes), full.transform(self.closes))
+        self.assertEqual(incremental.n_samples_seen_, len(self.closes))
+
+    def test_round_trips_through_json(self):
+        scaler = MinMaxScaler.from_series([self.closes.ravel(), self.closes.ravel()[:150] * 2])
+        restored = MinMaxScaler.from_dict(json.loads(json.dumps(scaler.column(1).to_dict())))
+        expected = MinMaxScaler().fit(self.closes[:150] * 2)
+        np.testing.assert_array_equal(restored.transform(self.closes), expected.transform(self.closes))
+        self.assertEqual(restored.n_samples_seen_, 150)
+
+
+class ForecastTests(SimpleTestCase):
+    def setUp(self):
+        self.model = Float32Model()
+        for target, value in [("inference_client", None), ("load_lstm_model", mock.Mock(return_value=self.model))]:
+            patcher = mock.patch.object(predictor, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_forecast_starts_with_next_day_price(self):
+        frames = [make_price_frame(), make_price_frame(days=400, seed=1) * 2]
+        one_day = predictor.generate_predictions(frames)
+        for (next_price, _, backtest, forecast), single in zip(predictor.generate_predictions(frames, 5), one_day):
+            self.assertEqual(len(forecast), 5)
+            self.assertEqual(forecast[0], next_price)
+            self.assertEqual(next_price, single[0])
+            np.testing.assert_array_equal(backtest, single[2])
+
+    def test_rolled_path_matches_one_window_at_a_time(self):
+        df = make_price_frame()
+        (_, scaler, _, forecast), = predictor.generate_predictions([df], 10)
+
+        window = list(scaler.transform(df[["Close"]].values[-60:]).ravel())
+        expected = []
+        for _ in range(10):
+            step = self.model.predict(np.array(window[-60:]).reshape(1, 60, 1))[0, 0]
+            expected.append(scaler.inverse_transform([[step]])[0, 0])
+            window.append(step)
+        np.testing.assert_allclose(forecast, expected, rtol=1e-6)
+
+    def test_horizon_is_validated(self):
+        self.assertEqual(predictor.parse_horizon("5"), 5)
+        for value in ["0", "31", "five", None]:
+            with self.assertRaises(ValueError):
+                predictor.parse_horizon(value)
+
+
+@unittest.skipUnless(HAS_KERAS, "keras is not installed")
+class BatchedBacktestTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.model = predictor.load_lstm_model()
+        cls.df = make_price_frame()
+
+    def test_batched_backtest_matches_sequential_loop(self):
+        scaler = MinMaxScaler()
+        scaler.fit(self.df[["Close"]].values)
+        actual_scaled = scaler.transform(self.df["Close"].values[-120:].reshape(-1, 1))
+
+        expected = []
+        for i in range(60):
+            pred_scaled = self.model.predict(actual_scaled[i:i + 60].reshape(1, 60, 1), verbose=0)
+            expected.append(scaler.inverse_transform(pred_scaled)[0][0])
+
+        _, _, batched, _ = predictor.generate_predictions([self.df])[0]
+
+        self.assertEqual(batched.shape, (60,))
+        np.testing.assert_allclose(batched, expected, rtol=1e-4)
+
+    def test_generate_prediction_reuses_batch_for_next_day(self):
+        next_price, scaler, backtest, _ = predictor.generate_predictions([self.df])[0]
+
+        scaled = scaler.transform(self.df[["Close"]].values)
+        pred_scaled = self.model.predict(scaled[-60:].reshape(1, 60, 1), verbose=0)
+        expected = scaler.inverse_transform(pred_scaled)[0][0]
+
+        self.assertEqual(len(backtest), 60)
+        self.assertAlmostEqual(next_price, expected, places=3)
+
+    def test_multi_ticker_batch_matches_single_predictions(self):
+        frames = [self.df, make_price_frame(days=500, seed=1) * 3]
+        batched = predictor.generate_predictions(frames)
+
+        for df, (next_price, _, backtest, _) in zip(frames, batched):
+            expected_price, _, expected_backtest, _ = predictor.generate_predictions([df])[0]
+            np.testing.assert_allclose(next_price, expected_price, rtol=1e-4)
+            np.testing.assert_allclose(backtest, expected_backtest, rtol=1e-4)
+
+
+@unittest.skipUnless(HAS_KERAS, "keras is not installed")
+class ModelRegistryTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "model.keras")
+        shutil.copy(predictor.MODEL_PATH, self.path)
+        self.registry = ModelRegistry(self.path, warmup_shape=(2, 60, 1))
+
+    def test_model_is_loaded_once(self):
+        first = self.registry.get()
+        self.assertIs(self.registry.get(), first)
+        self.assertEqual(self.registry.loads, 1)
+
+        stats = self.registry.stats()
+        self.assertEqual(stats["version"], file_sha256(self.path))
+        self.assertGreater(stats["load_seconds"], 0)
+        self.assertGreater(stats["weights_bytes"], 0)
+
+    def test_reloads_only_when_content_changes(self):
+        first = self.registry.get()
+        st = os.stat(self.path)
+        os.utime(self.path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        self.assertIs(self.registry.get(), first)
+
+        with open(self.path, "ab") as f:
+            f.write(b"\0")
+        self.assertIsNot(self.registry.get(), first)
+        self.assertEqual(self.registry.loads, 2)
+
+    def test_missing_file_raises(self):
+        registry = ModelRegistry(self.path + ".missing")
+        with self.assertRaises(FileNotFoundError):
+            registry.get()
+
+
+@unittest.skipUnless(HAS_KERAS, "keras is not installed")
+class NumpyModelTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.keras_model = predictor.load_lstm_model()
+        cls.model = NumpyModel.from_keras(cls.keras_model)
+        cls.windows = np.random.default_rng(0).random((64, 60, 1)).astype(np.float32)
+
+    def test_matches_keras_within_tolerance(self):
+        expected = self.keras_model.predict(self.windows, batch_size=64, verbose=0)
+        actual = self.model.predict(self.windows)
+        self.assertEqual(actual.shape, expected.shape)
+        self.assertEqual(actual.dtype, np.float32)
+        np.testing.assert_allclose(actual, expected, atol=1e-5)
+        np.testing.assert_allclose(NumpyModel.from_keras(self.keras_model, "float64").predict(self.windows),
+                                   expected, atol=1e-5)
+
+    def test_npz_round_trip_through_registry(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, "model.npz")
+        self.model.save(path)
+
+        registry = ModelRegistry(path, warmup_shape=(2, 60, 1), loader=NumpyModel.load)
+        loaded = registry.get()
+        self.assertIsInstance(loaded, NumpyModel)
+        self.assertIs(registry.get(), loaded)
+        self.assertEqual(registry.stats()["weights_bytes"], sum(w.nbytes for w in self.keras_model.get_weights()))
+        np.testing.assert_array_equal(loaded.predict(self.windows), self.model.predict(self.windows))
+
+
+class RecordingSource(FixtureSource):
+    def __init__(self, directory):
+        super().__init__(directory)
+        self.calls = []
+
+    def fetch(self, ticker, start, end):
+        self.calls.append((ticker, pd.Timestamp(start)))
+        return super().fetch(ticker, start, end)
+
+
+class PriceStoreTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.fixtures = os.path.join(tmp.name, "fixtures")
+        os.makedirs(self.fixtures)
+        self.source = RecordingSource(self.fixtures)
+        self.store = PriceStore(os.path.join(tmp.name, "store"), self.source, refresh_seconds=0)
+        self.frame = make_price_frame(days=300)
+        self.start, self.end = datetime(2020, 1, 1), datetime(2030, 1, 1)
+
+    def write_fixture(self, df):
+        df.to_csv(os.path.join(self.fixtures, "TEST.csv"), index_label="Date")
+
+    def test_repeat_loads_fetch_only_new_bars(self):
+        self.write_fixture(self.frame.iloc[:250])
+        first = self.store.load("test", self.start, self.end)
+        self.assertEqual(len(first), 250)
+
+        self.write_fixture(self.frame)
+        second = self.store.load("TEST", self.start, self.end)
+
+        self.assertEqual(self.source.calls[1], ("TEST", self.frame.index[248]))
+        self.assertEqual(len(second), 300)
+        np.testing.assert_allclose(second.values, self.frame.values)
+
+    def test_reads_are_memory_mapped(self):
+        self.write_fixture(self.frame)
+        df = self.store.load("TEST", self.start, self.end)
+
+        base = df["Close"].values
+        while base is not None and not isinstance(base, (np.memmap, mmap.mmap)):
+            base = getattr(base, "base", None)
+        self.assertIsNotNone(base)
+
+    def test_readjusted_history_is_refetched(self):
+        self.write_fixture(self.frame.iloc[:250])
+        self.store.load("TEST", self.start, self.end)
+
+        split = self.frame.copy()
+        split[["Close", "Open", "High", "Low"]] /= 2
+        self.write_fixture(split)
+        df = self.store.load("TEST", self.start, self.end)
+
+        np.testing.assert_allclose(df["Close"].values, split["Close"].values)
+
+    def test_unknown_ticker_returns_empty_frame(self):
+        self.assertTrue(self.store.load("NOPE", self.start, self.end).empty)
+
+    def test_unknown_ticker_is_not_fetched_again_for_a_while(self):
+        self.store.refresh_seconds = 900
+        for _ in range(3):
+            self.assertTrue(self.store.load("NOPE", self.start, self.end).empty)
+        self.assertEqual(len(self.source.calls), 1)
+
+        # Once the empty marker expires the ticker is tried again, and data
+        # that has appeared meanwhile replaces it.
+        self.frame.to_csv(os.path.join(self.fixtures, "NOPE.csv"), index_label="Date")
+        os.utime(self.store.path("NOPE"), (time.time() - self.store.empty_seconds,) * 2)
+        self.assertEqual(len(self.store.load("NOPE", self.start, self.end)), 300)
+        self.assertEqual(len(self.source.calls), 2)
+
+    def test_data_source_requires_fetch(self):
+        with self.assertRaises(TypeError):
+            DataSource()
+
+
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.lock_dir = tmp.name
+        self.calls = 0
+
+    def slow_compute(self):
+        self.calls += 1
+        time.sleep(0.2)
+        return {"price": 1.5}
+
+    def run_concurrently(self, flights, key):
+        results = []
+        threads = [
+            threading.Thread(target=lambda f=f: results.append(f.do(key, self.slow_compute)))
+            for f in flights
+        ]
+        for t in threads:
+            t.start()
+            time.sleep(0.01)
+        for t in threads:
+            t.join()
+        return results
+
+    def test_threads_share_one_computation(self):
+        flight = SingleFlight(self.lock_dir)
+        results = self.run_concurrently([flight] * 5, ("AAPL", "2025-01-02", "v1"))
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [{"price": 1.5}] * 5)
+
+    def test_processes_reuse_result_through_lock_dir(self):
+        # Separate instances stand in for separate worker processes.
+        flights = [SingleFlight(self.lock_dir) for _ in range(3)]
+        results = self.run_concurrently(flights, ("AAPL", "2025-01-02", "v1"))
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [{"price": 1.5}] * 3)
+
+    def test_later_calls_recompute(self):
+        flight = SingleFlight(self.lock_dir)
+        flight.do(("AAPL",), self.slow_compute)
+        flight.do(("AAPL",), self.slow_compute)
+        self.assertEqual(self.calls, 2)
+
+    def test_errors_propagate_to_waiters(self):
+        flight = SingleFlight(self.lock_dir)
+
+        def fail():
+            time.sleep(0.1)
+            raise ValueError("No data found for ticker: NOPE")
+
+        errors = []
+
+        def call():
+            try:
+                flight.do(("NOPE",), fail)
+            except ValueError as e:
+                errors.append(str(e))
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(errors), 3)
+
+    @unittest.skipIf(singleflight.fcntl is None, "file locks need fcntl")
+    def test_prune_keeps_lock_files_in_use(self):
+        fcntl = singleflight.fcntl
+        flight = SingleFlight(self.lock_dir, prune_seconds=60)
+        old = [os.path.join(self.lock_dir, "old" + suffix) for suffix in (".lock", ".json")]
+        for path in old:
+            open(path, "w").close()
+            os.utime(path, (time.time() - 3600,) * 2)
+
+        with open(old[0], "a") as held:
+            fcntl.flock(held, fcntl.LOCK_EX)
+            flight.do(("AAPL",), self.slow_compute)
+            self.assertEqual([os.path.exists(path) for path in old], [True, False])
+        flight.do(("MSFT",), self.slow_compute)
+        self.assertFalse(os.path.exists(old[0]))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ResultCacheTests(SimpleTestCase):
+    def test_entries_expire_after_ttl(self):
+        clock = FakeClock()
+        cache = ResultCache(ttl=10, clock=clock)
+        cache.set("a", 1)
+        self.assertEqual(cache.get("a"), 1)
+
+        clock.now = 10
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = ResultCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_counts_hits_and_misses(self):
+        cache = ResultCache()
+        cache.set("a", 1)
+        cache.get("a")
+        cache.get("b")
+
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["hit_ratio"]), (1, 1, 0.5))
+
+
+class PredictTickerCacheTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.df = make_price_frame()
+
+        for target, value in [
+            ("prediction_cache", ResultCache()),
+            ("prediction_flight", SingleFlight(tmp.name)),
+            ("result_store", ResultStore(os.path.join(tmp.name, "precomputed"))),
+        ]:
+            patcher = mock.patch.object(services, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(services.model_registry, "get_version", return_value="v1")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fake_pipeline(self, ticker, df, horizon=1):
+        return {"ticker": ticker, "next_day_price": float(len(df))}
+
+    def test_repeat_requests_hit_cache_until_new_bar(self):
+        with mock.patch.object(services, "fetch_stock_data", return_value=self.df.iloc[:-1]), \
+                mock.patch.object(services, "run_pipeline", side_effect=self.fake_pipeline) as pipeline:
+            first = services.predict_ticker("aapl")
+            second = services.predict_ticker("AAPL")
+        self.assertEqual(pipeline.call_count, 1)
+        self.assertEqual(first, second)
+
+        with mock.patch.object(services, "fetch_stock_data", return_value=self.df), \
+                mock.patch.object(services, "run_pipeline", side_effect=self.fake_pipeline) as pipeline:
+            third = services.predict_ticker("AAPL")
+        self.assertEqual(pipeline.call_count, 1)
+        self.assertEqual(third["next_day_price"], len(self.df))
+        self.assertEqual(services.prediction_cache.stats()["size"], 1)
+
+    def test_horizons_are_cached_separately(self):
+        with mock.patch.object(services, "fetch_stock_data", return_value=self.df), \
+                mock.patch.object(services, "run_pipeline", side_effect=self.fake_pipeline) as pipeline:
+            services.predict_ticker("AAPL")
+            services.predict_ticker("AAPL", 5)
+            services.predict_ticker("AAPL")
+        self.assertEqual([c.args[2] for c in pipeline.call_args_list], [1, 5])
+        self.assertEqual(services.prediction_cache.stats()["size"], 2)
+
+
+class QuotaTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("alice", password="pw")
+        quota.paid_status_cache.clear()
+        self.addCleanup(quota.paid_status_cache.clear)
+
+    def test_reserve_stops_at_the_daily_limit(self):
+        day = quota.reserve(self.user, 3)
+        quota.reserve(self.user, 2)
+        with self.assertRaises(quota.QuotaExceeded) as raised:
+            quota.reserve(self.user)
+        self.assertEqual(raised.exception.remaining, 0)
+        self.assertEqual(DailyUsage.objects.get(user=self.user, day=day).count, 5)
+
+    def test_batch_larger_than_allowance_is_rejected_whole(self):
+        quota.reserve(self.user, 3)
+        with self.assertRaises(quota.QuotaExceeded):
+            quota.reserve(self.user, 3)
+        self.assertEqual(quota.remaining(self.user), 2)
+
+    def test_consume_refunds_on_error(self):
+        with self.assertRaises(ValueError):
+            with quota.consume(self.user):
+                raise ValueError("boom")
+        self.assertEqual(quota.remaining(self.user), 5)
+
+    def test_paid_users_are_not_counted_and_status_is_cached(self):
+        Membership.objects.create(user=self.user, is_paid=True)
+        self.assertIsNone(quota.reserve(self.user))
+        with self.assertNumQueries(0):
+            for _ in range(10):
+                self.assertIsNone(quota.reserve(self.user))
+        self.assertFalse(DailyUsage.objects.exists())
+
+    def test_channels_have_separate_paid_status(self):
+        Membership.objects.create(user=self.user, is_paid=True)
+        self.assertFalse(quota.is_paid(self.user, channel="telegram"))
+
+    def test_payment_clears_cached_status(self):
+        self.assertFalse(quota.is_paid(self.user))
+        client = APIClient()
+        client.force_login(self.user)
+        with mock.patch.object(views, "render", return_value=views.HttpResponse()):
+            client.get("/success/")
+        self.assertTrue(quota.is_paid(self.user))
+
+
+FAKE_RESULT = {
+    "ticker": "AAPL",
+    "next_day_price": 123.456,
+    "last_bar": "2025-01-02",
+    "actual": [1.0, 2.0, 3.0],
+    "backtest": [1.1, 1.9, 3.2],
+    "metrics": {"mae": 0.1333, "rmse": 0.1414, "mape": 6.1111, "directional_accuracy": 100.0},
+    "forecast": [123.456],
+}
+
+
+class AsyncPredictTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("alice", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_async_submit_then_poll(self):
+        response = self.client.post("/api/v1/predict/?async=1", {"ticker": "aapl"})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["status"], PredictionJob.QUEUED)
+
+        status_url = response.data["status_url"]
+        self.assertEqual(self.client.get(status_url).data["result"], None)
+
+        with mock.patch.object(jobs, "predict_ticker", return_value=FAKE_RESULT):
+            self.assertEqual(jobs.drain(), 1)
+
+        data = self.client.get(status_url).data
+        self.assertEqual(data["status"], PredictionJob.SUCCEEDED)
+        self.assertEqual(data["result"]["next_day_price"], 123.46)
+        self.assertEqual(Prediction.objects.filter(user=self.user).count(), 1)
+
+    def test_failed_job_reports_error(self):
+        job = PredictionJob.objects.create(user=self.user, ticker="NOPE")
+        with mock.patch.object(jobs, "predict_ticker", side_effect=ValueError("No data found for ticker: NOPE")):
+            jobs.drain()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, PredictionJob.FAILED)
+        self.assertIn("NOPE", job.error)
+
+    def test_pending_jobs_count_against_free_tier(self):
+        for _ in range(5):
+            self.assertEqual(self.client.post("/api/v1/predict/?async=1", {"ticker": "AAPL"}).status_code, 202)
+        response = self.client.post("/api/v1/predict/?async=1", {"ticker": "AAPL"})
+        self.assertEqual(response.status_code, 403)
+
+    def test_failed_job_refunds_quota(self):
+        response = self.client.post("/api/v1/predict/?async=1", {"ticker": "NOPE"})
+        self.assertEqual(quota.remaining(self.user), 4)
+        with mock.patch.object(jobs, "predict_ticker", side_effect=ValueError("No data found for ticker: NOPE")):
+            jobs.drain()
+        self.assertEqual(PredictionJob.objects.get(id=response.data["job_id"]).status, PredictionJob.FAILED)
+        self.assertEqual(quota.remaining(self.user), 5)
+
+    def test_horizon_is_stored_in_metrics(self):
+        result = dict(FAKE_RESULT, forecast=[123.456, 124.0, 125.5])
+        with mock.patch.object(views, "predict_ticker", return_value=result) as predict:
+            response = self.client.post("/api/v1/predict/", {"ticker": "AAPL", "horizon": 3})
+        self.assertEqual(response.status_code, 200)
+        predict.assert_called_once_with("AAPL", 3)
+        self.assertEqual(response.data["forecast"], [123.456, 124.0, 125.5])
+        self.assertTrue(response.data["plot_urls"][-1].endswith("/forecast.png"))
+        self.assertEqual(Prediction.objects.get(user=self.user).metrics["forecast"], [123.456, 124.0, 125.5])
+
+        response = self.client.post("/api/v1/predict/", {"ticker": "AAPL", "horizon": 90})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(quota.remaining(self.user), 4)
+
+    def test_job_left_running_by_a_dead_worker_is_failed_and_refunded(self):
+        response = self.client.post("/api/v1/predict/?async=1", {"ticker": "AAPL"})
+        job = jobs.claim_next_job()  # The worker then dies.
+        PredictionJob.objects.filter(id=job.id).update(
+            started_at=timezone.now() - timedelta(seconds=jobs.JOB_LEASE_SECONDS + 1)
+        )
+        self.assertEqual(quota.remaining(self.user), 4)
+
+        self.assertEqual(jobs.drain(), 0)
+        data = self.client.get(response.data["status_url"]).data
+        self.assertEqual(data["status"], PredictionJob.FAILED)
+        self.assertEqual(quota.remaining(self.user), 5)
+        self.assertEqual(jobs.fail_stale_jobs(), 0)
+
+        # A worker that was only slow doesn't overwrite the outcome.
+        with mock.patch.object(jobs, "predict_ticker", side_effect=ValueError("late")):
+            jobs.run_job(job)
+        self.assertEqual(PredictionJob.objects.get(id=job.id).error, "The worker stopped before the job finished.")
+        self.assertEqual(quota.remaining(self.user), 5)
+
+    def test_job_swept_while_running_leaves_no_prediction(self):
+        response = self.client.post("/api/v1/predict/?async=1", {"ticker": "AAPL"})
+        job = jobs.claim_next_job()
+
+        def slow_predict(ticker, horizon):
+            # The sweep runs while the worker is still predicting.
+            PredictionJob.objects.filter(id=job.id).update(
+                started_at=timezone.now() - timedelta(seconds=jobs.JOB_LEASE_SECONDS + 1)
+            )
+            self.assertEqual(jobs.fail_stale_jobs(), 1)
+            return dict(FAKE_RESULT, ticker=ticker)
+
+        with mock.patch.object(jobs, "predict_ticker", side_effect=slow_predict):
+            jobs.run_job(job)
+        data = self.client.get(response.data["status_url"]).data
+        self.assertEqual(data["status"], PredictionJob.FAILED)
+        self.assertIsNone(PredictionJob.objects.get(id=job.id).prediction)
+        self.assertFalse(Prediction.objects.filter(user=self.user).exists())
+        self.assertEqual(quota.remaining(self.user), 5)
+
+    def test_jobs_are_private(self):
+        other = User.objects.create_user("bob", password="pw")
+        job = PredictionJob.objects.create(user=other, ticker="AAPL")
+        self.assertEqual(self.client.get(f"/api/v1/jobs/{job.id}/").status_code, 404)
+
+
+class BatchPredictTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("alice", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def fake_predict_tickers(self, tickers, horizon=1):
+        results = {t: dict(FAKE_RESULT, ticker=t) for t in tickers if t != "NOPE"}
+        errors = {t: "No data found for ticker: " + t for t in tickers if t == "NOPE"}
+        return results, errors
+
+    def test_batch_returns_per_item_results_and_errors(self):
+        with mock.patch.object(views, "predict_tickers", side_effect=self.fake_predict_tickers) as batch:
+            response = self.client.post(
+                "/api/v1/predict/batch/", {"tickers": ["aapl", "MSFT", "NOPE", "bad ticker!", "AAPL"]}, format="json"
+            )
+
+        self.assertEqual(response.status_code, 200)
+        batch.assert_called_once_with(["AAPL", "MSFT", "NOPE"], 1)
+        results = response.data["results"]
+        self.assertEqual([r["ticker"] for r in results], ["AAPL", "MSFT", "NOPE", "bad ticker!", "AAPL"])
+        self.assertEqual(results[0]["next_day_price"], 123.46)
+        self.assertIn("error", results[2])
+        self.assertIn("error", results[3])
+        self.assertEqual(
+            sorted(Prediction.objects.filter(user=self.user).values_list("ticker", flat=True)), ["AAPL", "MSFT"]
+        )
+
+    def test_whole_batch_counts_against_free_tier(self):
+        with mock.patch.object(views, "predict_tickers", side_effect=self.fake_predict_tickers) as batch:
+            response = self.client.post(
+                "/api/v1/predict/batch/", {"tickers": ["A", "B", "C", "D", "E", "F"]}, format="json"
+            )
+        self.assertEqual(response.status_code, 403)
+        batch.assert_not_called()
+
+    def test_only_successful_tickers_are_charged(self):
+        with mock.patch.object(views, "predict_tickers", side_effect=self.fake_predict_tickers):
+            self.client.post("/api/v1/predict/batch/", {"tickers": ["AAPL", "NOPE"]}, format="json")
+        self.assertEqual(quota.remaining(self.user), 4)
+
+    def test_requires_a_list(self):
+        response = self.client.post("/api/v1/predict/batch/", {"tickers": "AAPL"}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+
+class ChartViewTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        fixtures = os.path.join(tmp.name, "fixtures")
+        os.makedirs(fixtures)
+        df = make_price_frame()
+        df.to_csv(os.path.join(fixtures, "AAPL.csv"), index_label="Date")
+        store = PriceStore(os.path.join(tmp.name, "store"), FixtureSource(fixtures))
+        store.load("AAPL", datetime(2020, 1, 1), datetime(2030, 1, 1))
+
+        for target, value in [("CHART_CACHE_DIR", os.path.join(tmp.name, "charts")), ("price_store", store)]:
+            patcher = mock.patch.object(charts, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create_user("alice", password="pw")
+        self.client.force_login(self.user)
+        self.prediction = services.record_prediction(
+            self.user, dict(FAKE_RESULT, last_bar=df.index[-1].strftime("%Y-%m-%d"))
+        )
+
+    def test_prediction_links_to_lazy_charts(self):
+        self.assertEqual(self.prediction.chart1_path, f"charts/{self.prediction.pk}/history.png")
+        self.assertFalse(os.path.exists(charts.CHART_CACHE_DIR))
+
+    def test_renders_once_and_revalidates_with_etag(self):
+        for kind in charts.chart_kinds(self.prediction):
+            url = f"/charts/{self.prediction.pk}/{kind}.png"
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response["Content-Type"], "image/png")
+            self.assertTrue(b"".join(response.streaming_content).startswith(b"\x89PNG"))
+            self.assertIn("max-age", response["Cache-Control"])
+
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+            self.assertEqual(cached.status_code, 304)
+        self.assertEqual(charts.collect_garbage(dry_run=True)["files"], 2)
+
+    def test_forecast_chart_only_for_multi_day_predictions(self):
+        self.assertEqual(self.client.get(f"/charts/{self.prediction.pk}/forecast.png").status_code, 404)
+        prediction = services.record_prediction(
+            self.user, dict(FAKE_RESULT, last_bar=self.prediction.metrics["last_bar"], forecast=[123.456, 124.0])
+        )
+        self.assertEqual(charts.plot_urls(prediction)[-1], f"charts/{prediction.pk}/forecast.png")
+        response = self.client.get(f"/charts/{prediction.pk}/forecast.png")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b"".join(response.streaming_content).startswith(b"\x89PNG"))
+
+    def test_charts_are_private(self):
+        other = User.objects.create_user("bob", password="pw")
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(f"/charts/{self.prediction.pk}/history.png").status_code, 404)
+
+    def test_unknown_kind_is_404(self):
+        self.assertEqual(self.client.get(f"/charts/{self.prediction.pk}/volume.png").status_code, 404)
+
+    def test_history_chart_is_drawn_from_the_stored_series(self):
+        # ZZZZ isn't in the price store; Feb 29 used to break the date range.
+        history = charts.save_history(["2024-02-23", "2024-02-29"], [100.0, 101.5])
+        prediction = services.record_prediction(
+            self.user, dict(FAKE_RESULT, ticker="ZZZZ", last_bar="2024-02-29", history=history)
+        )
+        response = self.client.get(f"/charts/{prediction.pk}/history.png")
+        self.assertEqual(response.status_code, 200)
+
+        older = services.record_prediction(self.user, dict(FAKE_RESULT, ticker="ZZZZ", last_bar="2024-02-29"))
+        self.assertEqual(self.client.get(f"/charts/{older.pk}/history.png").status_code, 404)
+
+    def test_identical_charts_share_one_sharded_file(self):
+        again = services.record_prediction(self.user, dict(FAKE_RESULT, last_bar=self.prediction.metrics["last_bar"]))
+        etag, path = charts.get_chart(self.prediction, "history")
+        self.assertEqual(charts.get_chart(again, "history"), (etag, path))
+        self.assertEqual(path, os.path.join(charts.CHART_CACHE_DIR, etag[:2], etag + ".png"))
+
+        # A hit refreshes the last-used time only once it's a day old.
+        os.utime(path, (time.time() - 3600,) * 2)
+        charts.get_chart(again, "history")
+        self.assertLess(os.path.getmtime(path), time.time() - 3000)
+        os.utime(path, (time.time() - 2 * 86400,) * 2)
+        charts.get_chart(again, "history")
+        self.assertGreater(os.path.getmtime(path), time.time() - 60)
+
+
+class ChartGarbageTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        patcher = mock.patch.object(charts, "CHART_CACHE_DIR", os.path.join(tmp.name, "charts"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.now = time.time()
+
+    def write_chart(self, name, days_unused, size=100):
+        path = charts.chart_file(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(b"x" * size)
+        os.utime(path, (self.now - days_unused * 86400,) * 2)
+        return path
+
+    def test_removes_unused_then_least_recently_used(self):
+        paths = [self.write_chart(f"{i:02d}abc", days_unused=i * 10) for i in range(5)]
+        stale_tmp = paths[0] + ".1.2.tmp"
+        open(stale_tmp, "wb").close()
+        os.utime(stale_tmp, (self.now - 7200,) * 2)
+
+        self.assertEqual(
+            charts.collect_garbage(max_age_days=25, max_bytes=10_000, max_files=10, dry_run=True, now=self.now),
+            {"files": 3, "bytes": 300, "removed": 3, "removed_bytes": 200},
+        )
+        self.assertTrue(all(os.path.exists(path) for path in paths))
+
+        stats = charts.collect_garbage(max_age_days=25, max_bytes=250, max_files=10, now=self.now)
+        self.assertEqual((stats["files"], stats["bytes"]), (2, 200))
+        self.assertEqual([os.path.exists(path) for path in paths], [True, True, False, False, False])
+        self.assertFalse(os.path.exists(stale_tmp))
+
+        charts.collect_garbage(max_age_days=25, max_bytes=10_000, max_files=1, now=self.now)
+        self.assertEqual([os.path.exists(path) for path in paths[:2]], [True, False])
+
+    def test_legacy_charts_are_kept_while_referenced_or_collected(self):
+        # Old rows link to staticfiles/charts/...; logo.png is a collected asset.
+        for path in ("staticfiles/charts/AA_history.png", "staticfiles/charts/BB_history.png",
+                     "staticfiles/charts/logo.png", "assets/charts/logo.png"):
+            os.makedirs(os.path.dirname(os.path.join(self.tmp, path)), exist_ok=True)
+            open(os.path.join(self.tmp, path), "wb").close()
+        Prediction.objects.create(
+            user=User.objects.create_user("alice"), ticker="AA", predicted_price=1,
+            chart1_path="staticfiles/charts/AA_history.png", chart2_path="staticfiles/charts/AA_predicted.png",
+        )
+
+        static_root = os.path.join(self.tmp, "staticfiles")
+        with override_settings(BASE_DIR=self.tmp, STATIC_ROOT=static_root,
+                               STATICFILES_DIRS=[os.path.join(self.tmp, "assets")]):
+            call_command("chartgc", "--legacy", stdout=io.StringIO())
+        self.assertEqual(sorted(os.listdir(os.path.join(static_root, "charts"))), ["AA_history.png", "logo.png"])
+
+    def test_chart_removed_before_it_is_opened_is_rendered_again(self):
+        prediction = Prediction(ticker="AAPL", metrics={
+            "last_bar": "2025-07-03", "backtest": {"actual": [1.0, 2.0], "predicted": [1.5, 2.5]},
+        })
+        _, path = charts.get_chart(prediction, "predicted")
+        with mock.patch.object(charts, "get_chart", side_effect=[("etag", path + ".gone"), ("etag", path)]):
+            etag, f = charts.open_chart(prediction, "predicted")
+        with f:
+            self.assertTrue(f.read().startswith(b"\x89PNG"))
+
+
+class PrecomputeTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        fixtures = os.path.join(tmp.name, "fixtures")
+        os.makedirs(fixtures)
+        for seed, ticker in enumerate(["AAPL", "MSFT"]):
+            make_price_frame(seed=seed).to_csv(os.path.join(fixtures, f"{ticker}.csv"), index_label="Date")
+        store = PriceStore(os.path.join(tmp.name, "prices"), FixtureSource(fixtures))
+        self.results = ResultStore(os.path.join(tmp.name, "precomputed"))
+
+        for module, target, value in [
+            (predictor, "price_store", store),
+            (predictor, "inference_client", None),
+            (predictor, "load_lstm_model", mock.Mock(return_value=Float32Model())),
+            (predictor.model_registry, "get_version", mock.Mock(return_value="v1")),
+            (charts, "price_store", store),
+            (charts, "CHART_CACHE_DIR", os.path.join(tmp.name, "charts")),
+            (services, "prediction_cache", ResultCache()),
+            (services, "prediction_flight", SingleFlight(os.path.join(tmp.name, "locks"))),
+            (services, "result_store", self.results),
+            (precompute, "result_store", self.results),
+        ]:
+            patcher = mock.patch.object(module, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_watchlist_puts_configured_then_most_predicted(self):
+        user = User.objects.create_user("alice", password="pw")
+        for ticker in ["MSFT", "AAPL", "AAPL", "TSLA", "AAPL", "MSFT"]:
+            services.record_prediction(user, dict(FAKE_RESULT, ticker=ticker))
+        self.assertEqual(precompute.watchlist(limit=3, configured=["nvda"]), ["NVDA", "AAPL", "MSFT"])
+        self.assertEqual(precompute.watchlist(limit=5, configured=[]), ["AAPL", "MSFT", "TSLA"])
+
+    def test_requests_are_served_from_precomputed_results(self):
+        summary = precompute.precompute(["AAPL", "MSFT", "NOPE"], batch_size=1)
+        self.assertEqual(summary["computed"], 2)
+        self.assertEqual(list(summary["errors"]), ["NOPE"])
+        self.assertEqual(charts.collect_garbage(dry_run=True)["files"], 4)
+        self.assertEqual(precompute.precompute(["AAPL", "MSFT"])["fresh"], 2)
+
+        services.prediction_cache.clear()  # As in a web worker, which didn't run the precompute.
+        with mock.patch.object(services, "run_pipeline") as pipeline:
+            result = services.predict_ticker("AAPL")
+            self.assertEqual(services.predict_ticker("AAPL"), result)
+        pipeline.assert_not_called()
+        self.assertEqual(result["ticker"], "AAPL")
+        history = charts.load_history(result["history"])
+        self.assertEqual(history["dates"][-1], result["last_bar"])
+        self.assertEqual(len(history["close"]), 300)  # Daily closes, stored once and referenced.
+        self.assertEqual(precompute.report()[0]["hits"], 1)
+        self.assertGreater(precompute.report()[0]["seconds_saved"], 0)
+
+    def test_scheduler_runs_at_the_next_occurrence(self):
+        scheduler = precompute.DailyScheduler("03:30", lambda: None)
+        now = timezone.make_aware(datetime(2025, 1, 2, 12, 0))
+        self.assertEqual(scheduler.next_run(now), timezone.make_aware(datetime(2025, 1, 3, 3, 30)))
+        early = timezone.make_aware(datetime(2025, 1, 2, 1, 0))
+        self.assertEqual(scheduler.next_run(early), timezone.make_aware(datetime(2025, 1, 2, 3, 30)))
+        with self.assertRaises(ValueError):
+            precompute.DailyScheduler("25:00", lambda: None)
+
+
+class BacktestMetricsTests(SimpleTestCase):
+    def test_error_metrics(self):
+        metrics = predictor.backtest_metrics([100.0, 102.0, 101.0, 103.0], [101.0, 101.0, 102.0, 104.0])
+
+        self.assertAlmostEqual(metrics["mae"], 1.0)
+        self.assertAlmostEqual(metrics["rmse"], 1.0)
+        self.assertAlmostEqual(metrics["mape"], np.mean([1 / 100, 1 / 102, 1 / 101, 1 / 103]) * 100)
+        # Moves from the previous actual: up/up (hit), down/flat (miss), up/up (hit).
+        self.assertAlmostEqual(metrics["directional_accuracy"], 200 / 3)
+
+
+class PredictionListTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("alice", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        services.record_prediction(self.user, dict(FAKE_RESULT, history="0" * 40))
+
+    def test_backtest_series_is_omitted_by_default(self):
+        metrics = self.client.get("/api/v1/predictions/").data["results"][0]["metrics"]
+        self.assertEqual(metrics["mae"], FAKE_RESULT["metrics"]["mae"])
+        self.assertNotIn("backtest", metrics)
+        self.assertNotIn("history", metrics)
+
+    def test_include_backtest(self):
+        metrics = self.client.get("/api/v1/predictions/?include=backtest").data["results"][0]["metrics"]
+        self.assertEqual(metrics["backtest"]["predicted"], FAKE_RESULT["backtest"])
+
+    def test_fields_limits_response(self):
+        row = self.client.get("/api/v1/predictions/?fields=ticker,predicted_price").data["results"][0]
+        self.assertEqual(set(row), {"ticker", "predicted_price"})
+
+    def test_cursor_pages_walk_history_newest_first(self):
+        for ticker in ["MSFT", "GOOG", "TSLA"]:
+            services.record_prediction(self.user, dict(FAKE_RESULT, ticker=ticker))
+        first = self.client.get("/api/v1/predictions/?page_size=2&fields=ticker").data
+        second = self.client.get(first["next"]).data
+        self.assertEqual([r["ticker"] for r in first["results"]], ["TSLA", "GOOG"])
+        self.assertEqual([r["ticker"] for r in second["results"]], ["MSFT", "AAPL"])
+        self.assertIsNone(second["next"])
+
+    def test_migration_normalizes_old_tickers(self):
+        migration = importlib.import_module("api.migrations.0009_prediction_history_indexes")
+        old = services.record_prediction(self.user, dict(FAKE_RESULT, ticker=" msft "))
+        migration.uppercase_tickers(django_apps, None)
+        old.refresh_from_db()
+        self.assertEqual(old.ticker, "MSFT")
+
+    def test_ticker_filter_is_case_insensitive(self):
+        services.record_prediction(self.user, dict(FAKE_RESULT, ticker="MSFT"))
+        rows = self.client.get("/api/v1/predictions/?ticker=msft&fields=ticker").data["results"]
+        self.assertEqual([r["ticker"] for r in rows], ["MSFT"])
+        self.assertEqual(self.client.get("/api/v1/predictions/?ticker=bad!").status_code, 400)
+
+
+class PredictionExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("alice", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for ticker, day in [("AAPL", 1), ("MSFT", 2), ("AAPL", 3)]:
+            prediction = services.record_prediction(self.user, dict(FAKE_RESULT, ticker=ticker))
+            Prediction.objects.filter(pk=prediction.pk).update(
+                created_at=timezone.make_aware(datetime(2025, 1, day, 12, 0))
+            )
+        services.record_prediction(User.objects.create_user("bob", password="pw"), FAKE_RESULT)
+
+    def test_csv_streams_history_newest_first(self):
+        response = self.client.get("/api/v1/predictions/export/?format=csv")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        rows = list(csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual([r["ticker"] for r in rows], ["AAPL", "MSFT", "AAPL"])
+        self.assertEqual(rows[0]["predicted_price"], "123.46")
+        self.assertEqual(float(rows[0]["mae"]), FAKE_RESULT["metrics"]["mae"])
+        self.assertEqual(rows[0]["last_bar"], FAKE_RESULT["last_bar"])
+
+    def test_ndjson_filters_and_gzip(self):
+        response = self.client.get(
+            "/api/v1/predictions/export/?format=ndjson&ticker=aapl&since=2025-01-02&until=2025-01-03",
+            HTTP_ACCEPT_ENCODING="gzip, deflate",
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        lines = gzip.decompress(b"".join(response.streaming_content)).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["ticker"], "AAPL")
+        self.assertEqual(rows[0]["directional_accuracy"], 100.0)
+        self.assertTrue(rows[0]["created_at"].startswith("2025-01-03"))
+
+    def test_invalid_parameters(self):
+        for query in ["format=xml", "since=yesterday", "until=2025-02-30", "ticker=bad!"]:
+            self.assertEqual(self.client.get("/api/v1/predictions/export/?" + query).status_code, 400, query)
+
+
+class DatabaseTests(TestCase):
+    def test_sqlite_pragmas_are_applied_on_connect(self):
+        from django.db import connection
+
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        raw = sqlite3.connect(os.path.join(tmp.name, "db.sqlite3"))
+        self.addCleanup(raw.close)
+        db.configure_sqlite(None, mock.Mock(vendor="sqlite", cursor=raw.cursor))
+        self.assertEqual(raw.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+
+    def test_buffered_history_is_written_in_one_batch(self):
+        user = User.objects.create_user("alice", password="pw")
+        buffer = db.WriteBuffer(services.save_predictions, max_size=3, max_delay=60)
+        self.addCleanup(buffer.flush)
+        with mock.patch.object(services, "history_buffer", buffer):
+            pending = [services.buffer_prediction(user, dict(FAKE_RESULT, ticker=t)) for t in ["A", "B"]]
+            self.assertEqual(Prediction.objects.count(), 0)
+            self.assertIsNone(pending[0].pk)
+
+            with self.assertNumQueries(4):  # SAVEPOINT, INSERT, UPDATE, RELEASE
+                services.buffer_prediction(user, dict(FAKE_RESULT, ticker="C"))
+        self.assertEqual(list(Prediction.objects.order_by("id").values_list("ticker", flat=True)), ["A", "B", "C"])
+        self.assertEqual(pending[0].chart1_path, f"charts/{pending[0].pk}/history.png")
+        self.assertEqual((buffer.flushes, buffer.written, len(buffer)), (1, 3, 0))
+
+    def test_failed_batch_is_dropped(self):
+        buffer = db.WriteBuffer(mock.Mock(side_effect=RuntimeError("disk full")), max_delay=60)
+        buffer.add(object())
+        with self.assertLogs("api.db", "ERROR"):
+            self.assertEqual(buffer.flush(), 0)
+        self.assertEqual((buffer.dropped, len(buffer)), (1, 0))
+
+
+class DashboardTests(TransactionTestCase):
+    # Real commits, so history versions are bumped on commit as in production.
+    # Query budgets for one dashboard render: session and user lookups by
+    # the auth middleware, paid status, and one history page.
+    FIRST_RENDER_QUERIES = 4
+    CACHED_RENDER_QUERIES = 2
+
+    def setUp(self):
+        self.user = User.objects.create_user("alice", password="pw")
+        self.client.force_login(self.user)
+        for cache in (django_cache, quota.paid_status_cache):
+            cache.clear()
+            self.addCleanup(cache.clear)
+
+    def test_history_is_paginated_by_keyset(self):
+        created = [services.record_prediction(self.user, FAKE_RESULT) for _ in range(views.HISTORY_PAGE_SIZE + 5)]
+
+        first = self.client.get("/")
+        self.assertEqual([p["id"] for p in first.context["past_predictions"]],
+                         [p.pk for p in reversed(created[5:])])
+        second = self.client.get(f"/?before={first.context['older_cursor']}")
+        self.assertEqual([p["id"] for p in second.context["past_predictions"]],
+                         [p.pk for p in reversed(created[:5])])
+        self.assertIsNone(second.context["older_cursor"])
+
+    def test_unknown_or_invalid_cursor_shows_the_first_page(self):
+        created = [services.record_prediction(self.user, FAKE_RESULT) for _ in range(3)]
+        newest_first = [p.pk for p in reversed(created)]
+        missing = created[-1].pk + 100
+        for before in (missing, 2 ** 70, -1, "abc", "²"):
+            django_cache.clear()
+            response = self.client.get("/", {"before": before})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([p["id"] for p in response.context["past_predictions"]], newest_first)
+
+    def test_render_stays_within_query_budget(self):
+        for _ in range(views.HISTORY_PAGE_SIZE + 5):
+            services.record_prediction(self.user, FAKE_RESULT)
+        with self.assertNumQueries(self.FIRST_RENDER_QUERIES):
+            self.assertEqual(self.client.get("/").status_code, 200)
+        with self.assertNumQueries(self.CACHED_RENDER_QUERIES):
+            self.client.get("/")
+        cursor = Prediction.objects.order_by("id")[10].pk
+        with self.assertNumQueries(self.FIRST_RENDER_QUERIES - 1):  # Paid status is cached.
+            self.client.get(f"/?before={cursor}")
+
+    def test_new_prediction_refreshes_cached_history(self):
+        services.record_prediction(self.user, FAKE_RESULT)
+        self.assertNotContains(self.client.get("/"), "MSFT")
+
+        with mock.patch.object(views, "predict_ticker", return_value=dict(FAKE_RESULT, ticker="MSFT")):
+            response = self.client.post("/", {"ticker": "MSFT"})
+        self.assertContains(response, "MSFT – $123.46")
+        self.assertContains(response, "Next day")  # The form is complete on every branch.
+
+        with mock.patch.object(views, "predict_ticker", side_effect=ValueError("No data found for ticker: NOPE")):
+            response = self.client.post("/", {"ticker": "NOPE"})
+        self.assertContains(response, "No data found for ticker: NOPE")
+        self.assertContains(response, "Next day")
+
+    def test_bot_predictions_show_up_without_waiting_for_the_ttl(self):
+        services.record_prediction(self.user, FAKE_RESULT)
+        self.assertNotContains(self.client.get("/"), "MSFT")
+        # As the bot process writes them: in a batch, outside any web request.
+        services.save_predictions([services.build_prediction(self.user, dict(FAKE_RESULT, ticker="MSFT"))])
+        self.assertContains(self.client.get("/"), "MSFT – $123.46")
+
+    def test_render_during_a_buffered_write_is_not_cached_as_current(self):
+        self.assertNotContains(self.client.get("/"), "MSFT")
+
+        def writer(batch):
+            services.save_predictions(batch)
+            # Another worker renders before the batch commits, so it can't
+            # see the new rows yet.
+            with mock.patch.object(views, "_past_predictions", return_value=([], None)):
+                self.client.get("/")
+
+        buffer = db.WriteBuffer(writer, max_delay=60)
+        buffer.add(services.build_prediction(self.user, dict(FAKE_RESULT, ticker="MSFT")))
+        self.assertEqual(buffer.flush(), 1)
+        self.assertContains(self.client.get("/"), "MSFT – $123.46")
+
+
+class BenchmarkHelpersTests(SimpleTestCase):
+    def test_summarize_reports_percentiles_in_ms(self):
+        summary = benchmarks.summarize([0.001 * i for i in range(1, 101)])
+        self.assertAlmostEqual(summary["p50"], 50.5)
+        self.assertEqual(summary["n"], 100)
+        self.assertLessEqual({"p90", "p95", "p99", "mean", "min", "max"}, set(summary))
+
+    def test_compare_matches_stages_by_name(self):
+        baseline = {"stages": {"a": {"p50": 10.0}, "gone": {"p50": 1.0}}}
+        current = {"stages": {"a": {"p50": 5.0}, "new": {"p50": 1.0}}}
+        self.assertEqual(list(benchmarks.compare(current, baseline)), [("a", 10.0, 5.0, 0.5)])
+
+    def test_import_report_sums_self_time_by_package(self):
+        output = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       100 |        100 |   numpy.core\n"
+            "import time:       300 |        400 | numpy\n"
+            "import time:      1000 |       1000 | django\n"
+        )
+        report = benchmarks.import_report(benchmarks.parse_importtime(output))
+        self.assertEqual(report["packages"], [("django", 1.0), ("numpy", 0.4)])
+        self.assertEqual(report["total_ms"], 1.4)
+
+    def test_url_conf_does_not_import_heavy_libraries(self):
+        loaded = {name.split(".")[0] for name, _, _ in benchmarks.measure_imports(["core.urls"])}
+        self.assertFalse(loaded & {"tensorflow", "keras", "sklearn", "matplotlib", "pandas", "yfinance"})
+
+    def test_suite_runs_end_to_end_on_the_fixture(self):
+        with mock.patch.object(predictor, "load_lstm_model", mock.Mock(return_value=Float32Model())), \
+                mock.patch.object(predictor, "inference_client", None):
+            results = benchmarks.BenchmarkSuite(iterations=1, log=lambda line: None).run(views=False)
+        self.assertLessEqual(
+            {"fetch_stock_data_cold", "generate_predictions_x8", "chart_history_render", "chart_forecast_cached"},
+            set(results["stages"]),
+        )
+        self.assertEqual(results["stages"]["generate_prediction_warm"]["n"], 1)
+
+    def test_suite_runs_against_an_empty_result_store_and_cache(self):
+        seen = {}
+
+        def bench_stages(suite):
+            seen["directory"] = services.result_store.directory
+            seen["cache"] = settings.CACHES["default"]["BACKEND"]
+
+        real = services.result_store.directory
+        with mock.patch.object(benchmarks.BenchmarkSuite, "bench_stages", bench_stages):
+            benchmarks.BenchmarkSuite(iterations=1, log=lambda line: None).run(views=False)
+        self.assertNotEqual(seen["directory"], real)
+        self.assertFalse(os.path.exists(seen["directory"]))
+        self.assertEqual(seen["cache"], "django.core.cache.backends.locmem.LocMemCache")
+        self.assertEqual(services.result_store.directory, real)
+
+    def test_fixture_is_bundled(self):
+        df = FixtureSource(benchmarks.FIXTURE_DIR).fetch(benchmarks.FIXTURE_TICKER, datetime(2000, 1, 1), datetime(2030, 1, 1))
+        self.assertGreater(len(df), 2000)
+
+
+class TelemetryTests(SimpleTestCase):
+    def test_histogram_renders_cumulative_buckets(self):
+        hist = telemetry.Histogram("t_seconds", "Test.", ["stage"], buckets=(0.1, 1.0))
+        hist.observe(0.05, stage="a")
+        hist.observe(0.5, stage="a")
+        hist.observe(5, stage="a")
+        lines = hist.render()
+        self.assertIn('t_seconds_bucket{stage="a",le="0.1"} 1', lines)
+        self.assertIn('t_seconds_bucket{stage="a",le="1"} 2', lines)
+        self.assertIn('t_seconds_bucket{stage="a",le="+Inf"} 3', lines)
+        self.assertIn('t_seconds_count{stage="a"} 3', lines)
+
+    def test_track_counts_errors_and_restores_inflight(self):
+        errors = telemetry.STAGE_ERRORS.value(stage="test_stage")
+        observed = telemetry.STAGE_SECONDS.count(stage="test_stage")
+        with self.assertRaises(RuntimeError):
+            with telemetry.track("test_stage"):
+                raise RuntimeError("boom")
+        self.assertEqual(telemetry.STAGE_ERRORS.value(stage="test_stage"), errors + 1)
+        self.assertEqual(telemetry.STAGE_SECONDS.count(stage="test_stage"), observed + 1)
+        self.assertEqual(telemetry.STAGE_INFLIGHT.value(stage="test_stage"), 0)
+
+    def test_label_values_are_escaped(self):
+        counter = telemetry.Counter("t_total", "Test.", ["view"])
+        counter.inc(view='a"b')
+        self.assertIn('t_total{view="a\\"b"} 1', counter.render())
+
+    def test_profiler_collects_stacks(self):
+        with telemetry.SamplingProfiler(interval=0.001) as profiler:
+            deadline = time.perf_counter() + 0.05
+            while time.perf_counter() < deadline:
+                pass
+        self.assertIn("test_profiler_collects_stacks", profiler.collapsed())
+
+
+class MetricsEndpointTests(TestCase):
+    def test_exposes_stage_request_and_cache_metrics(self):
+        self.client.get("/healthz/")
+        response = self.client.get("/metrics/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        body = response.content.decode()
+        self.assertIn('stockinsight_http_request_seconds_count{view="healthz",method="GET",status="200"}', body)
+        self.assertIn("stockinsight_prediction_cache_hits_total", body)
+        self.assertIn("stockinsight_model_loaded", body)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_token_is_required_when_configured(self):
+        self.assertEqual(self.client.get("/metrics/").status_code, 401)
+        response = self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+
+    def test_staff_request_can_be_profiled(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        admin = User.objects.create_user("admin", password="pw", is_staff=True)
+        bob = User.objects.create_user("bob", password="pw")
+
+        def auth(user):
+            return {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(user).access_token}"}
+
+        with override_settings(PROFILE_REQUESTS=True, PROFILE_DIR=tmp.name, METRICS_TOKEN="secret"):
+            response = self.client.get("/healthz/", HTTP_X_PROFILE="1", **auth(admin))
+            self.assertTrue(os.path.exists(os.path.join(tmp.name, response["X-Profile-File"])))
+            response = self.client.get("/healthz/", HTTP_X_PROFILE="1", HTTP_AUTHORIZATION="Bearer secret")
+            self.assertIn("X-Profile-File", response)
+            self.client.force_login(admin)
+            self.assertIn("X-Profile-File", self.client.get("/healthz/", HTTP_X_PROFILE="1"))
+            self.client.logout()
+
+            # Anyone else doesn't even start the sampler.
+            with mock.patch("api.middleware.SamplingProfiler") as profiler:
+                for headers in ({}, auth(bob), {"HTTP_AUTHORIZATION": "Bearer wrong"}):
+                    self.assertNotIn("X-Profile-File", self.client.get("/healthz/", HTTP_X_PROFILE="1", **headers))
+            profiler.assert_not_called()
+
+
+class PredictionQueueTests(SimpleTestCase):
+    def test_admission_reports_position_and_limits(self):
+        queue = botqueue.PredictionQueue(workers=2, max_pending=3, per_chat=1)
+        self.assertEqual(queue.admit(1), 0)
+        self.assertEqual(queue.admit(2), 0)
+        self.assertEqual(queue.admit(3), 1)
+        with self.assertRaises(botqueue.ChatBusy):
+            queue.admit(1)
+        with self.assertRaises(botqueue.QueueFull):
+            queue.admit(4)
+        queue.release(3)
+        self.assertEqual(queue.admit(4), 1)
+
+    def test_work_runs_off_the_event_loop(self):
+        queue = botqueue.PredictionQueue(workers=1)
+        started = threading.Event()
+
+        def blocking():
+            started.set()
+            time.sleep(0.2)
+            return threading.get_ident()
+
+        async def scenario():
+            queue.admit(1)
+            task = asyncio.ensure_future(queue.run(1, blocking))
+            # The loop stays responsive while the worker thread sleeps.
+            await asyncio.get_running_loop().run_in_executor(None, started.wait)
+            ticks = 0
+            while not task.done():
+                ticks += 1
+                await asyncio.sleep(0.01)
+            return await task, ticks
+
+        worker, ticks = asyncio.run(scenario())
+        self.assertNotEqual(worker, threading.get_ident())
+        self.assertGreater(ticks, 5)
+        self.assertEqual(queue.pending, 0)
+        self.assertFalse(queue.by_chat)
+
+
+class FakeTelegramRequest(BaseRequest):
+    # Answers Bot API calls locally and records them, so webhook tests never
+    # reach Telegram.
+    def __init__(self):
+        self.calls = []
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        endpoint = url.rsplit("/", 1)[-1]
+        params = request_data.parameters if request_data else {}
+        self.calls.append((endpoint, params))
+        if endpoint == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Bot", "username": "test_bot"}
+        elif endpoint == "sendMessage":
+            result = {"message_id": len(self.calls), "date": 0, "chat": {"id": params["chat_id"], "type": "private"},
+                      "text": params["text"]}
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+
+def command_update(text, chat_id=42, username="alice"):
+    return {
+        "update_id": 1,
+        "message": {
+            "message_id": 1,
+            "date": 0,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": username, "username": username},
+            "text": text,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}],
+        },
+    }
+
+
+class TelegramWebhookTests(TestCase):
+    def setUp(self):
+        self.fake = FakeTelegramRequest()
+        self.django_requests = []
+
+        async def django_app(scope, receive, send):
+            self.django_requests.append(scope["path"])
+            await send({"type": "http.response.start", "status": 204, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        self.hook = TelegramWebhook(
+            django_app,
+            lambda: bot.build_application(token="123:TEST", request=self.fake, webhook=True),
+            path="/telegram/webhook/",
+            secret="s3cret",
+        )
+
+    async def post(self, path, body, secret="s3cret"):
+        messages = [{"type": "http.request", "body": body, "more_body": False}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        headers = [(b"x-telegram-bot-api-secret-token", secret.encode())]
+        await self.hook({"type": "http", "method": "POST", "path": path, "headers": headers}, receive, send)
+        return sent[0]["status"]
+
+    async def replies(self, count):
+        # Updates are processed in the background; wait for the bot's replies.
+        for _ in range(200):
+            texts = [params["text"] for endpoint, params in self.fake.calls if endpoint == "sendMessage"]
+            if len(texts) >= count:
+                return texts
+            await asyncio.sleep(0.01)
+        self.fail("No reply from the bot")
+
+    def test_updates_are_dispatched_to_the_shared_handlers(self):
+        async def scenario():
+            try:
+                status = await self.post("/telegram/webhook/", json.dumps(command_update("/start")).encode())
+                self.assertEqual(status, 200)
+                self.assertEqual(await self.replies(1), ["Hi @alice! You've been registered."])
+
+                await self.post("/telegram/webhook/", json.dumps(command_update("/latest")).encode())
+                self.assertEqual((await self.replies(2))[1], "No predictions yet.")
+            finally:
+                await self.hook.shutdown()
+
+        async_to_sync(scenario)()
+        self.assertTrue(TelegramUser.objects.filter(chat_id=42, username="alice").exists())
+
+    def test_failed_reservation_frees_the_chat_slot(self):
+        queue = botqueue.PredictionQueue(workers=1)
+        reserve = mock.Mock(side_effect=OperationalError("database is locked"))
+
+        async def scenario():
+            try:
+                await self.post("/telegram/webhook/", json.dumps(command_update("/start")).encode())
+                await self.replies(1)
+                await self.post("/telegram/webhook/", json.dumps(command_update("/predict AAPL")).encode())
+                for _ in range(200):
+                    if reserve.called and not queue.by_chat:
+                        break
+                    await asyncio.sleep(0.01)
+            finally:
+                await self.hook.shutdown()
+
+        with mock.patch.object(bot, "prediction_queue", queue), mock.patch.object(bot, "reserve", reserve):
+            async_to_sync(scenario)()
+        reserve.assert_called_once()
+        self.assertEqual(queue.pending, 0)
+        self.assertFalse(queue.by_chat)
+
+    def test_malformed_update_is_acknowledged_and_dropped(self):
+        async def scenario():
+            try:
+                for body in (b"[]", b"{}", b'{"update_id": 1, "message": "hi"}'):
+                    self.assertEqual(await self.post("/telegram/webhook/", body), 200)
+            finally:
+                await self.hook.shutdown()
+
+        with self.assertLogs("api.webhook", "ERROR") as logs:
+            async_to_sync(scenario)()
+        self.assertEqual(len(logs.records), 3)
+        self.assertNotIn("sendMessage", [endpoint for endpoint, _ in self.fake.calls])
+
+    def test_rejects_bad_secret_and_passes_other_paths_through(self):
+        async def scenario():
+            self.assertEqual(await self.post("/telegram/webhook/", b"{}", secret="wrong"), 403)
+            self.assertEqual(await self.post("/telegram/webhook/", b"not json"), 400)
+            self.assertEqual(await self.post("/healthz/", b""), 204)
+
+        async_to_sync(scenario)()
+        self.assertEqual(self.django_requests, ["/healthz/"])
+        self.assertEqual(self.fake.calls, [])
+
+
+class SumModel:
+    def __init__(self):
+        self.batch_sizes = []
+
+    def predict(self, windows, batch_size=None, verbose=0):
+        self.batch_sizes.append(len(windows))
+        return windows.sum(axis=(1, 2)).reshape(-1, 1)
+
+
+class InferenceServerTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.socket_path = os.path.join(tmp.name, "inference.sock")
+        self.model = SumModel()
+        self.server = inference.InferenceServer(self.socket_path, lambda: self.model, batch_delay=0.05)
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.shutdown)
+        while not os.path.exists(self.socket_path):
+            time.sleep(0.01)
+        self.client = inference.InferenceClient(self.socket_path)
+
+    def test_concurrent_requests_share_one_forward_pass(self):
+        inputs = [np.full((3, 60, 1), i, dtype=np.float32) for i in range(6)]
+        results = [None] * len(inputs)
+
+        def call(i):
+            results[i] = self.client.predict(inputs[i])
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(len(inputs))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        for i, result in enumerate(results):
+            np.testing.assert_array_equal(result.ravel(), [60.0 * i] * 3)
+        self.assertLess(len(self.model.batch_sizes), len(inputs))
+        self.assertEqual(sum(self.model.batch_sizes), 18)
+
+    def test_bad_input_is_reported_to_the_client(self):
+        with self.assertRaises(inference.RemoteInferenceError):
+            self.client.predict(np.zeros((3, 60)))
+
+    def test_predictor_falls_back_to_local_model(self):
+        missing = inference.InferenceClient(self.socket_path + ".missing")
+        local = SumModel()
+        windows = np.ones((2, 60, 1))
+        with mock.patch.object(predictor, "inference_client", missing), \
+                mock.patch.object(predictor, "load_lstm_model", return_value=local):
+            np.testing.assert_array_equal(predictor.forward(windows).ravel(), [60.0, 60.0])
+        with mock.patch.object(predictor, "inference_client", self.client):
+            np.testing.assert_array_equal(predictor.forward(windows).ravel(), [60.0, 60.0])
+        self.assertEqual(local.batch_sizes, [2])
+        self.assertEqual(self.model.batch_sizes, [2])
+
+
+class ConfigTests(SimpleTestCase):
+    def test_blank_values_fall_back_to_defaults(self):
+        with mock.patch.dict(os.environ, {"STOCKINSIGHT_TEST": ""}):
+            self.assertEqual(getenv("STOCKINSIGHT_TEST", "data/prices"), "data/prices")
+            self.assertEqual(getenv_int("STOCKINSIGHT_TEST", 900), 900)
+            self.assertTrue(getenv_bool("STOCKINSIGHT_TEST", True))
+        with mock.patch.dict(os.environ, {"STOCKINSIGHT_TEST": "60"}):
+            self.assertEqual(getenv_int("STOCKINSIGHT_TEST", 900), 60)
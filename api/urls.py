@@ -1,10 +1,13 @@
 from django.urls import path
-from .views import RegisterView, PredictView, PredictionListView
+from .views import RegisterView, PredictView, BatchPredictView, PredictionListView, PredictionExportView, PredictionJobView
 from rest_framework_simplejwt.views import TokenObtainPairView
 
 urlpatterns = [
     path("register/", RegisterView.as_view(), name="register"),
     path("token/", TokenObtainPairView.as_view(), name="token"),
     path("predict/", PredictView.as_view(), name="predict"),         
+    path("predict/batch/", BatchPredictView.as_view(), name="predict-batch"),
     path("predictions/", PredictionListView.as_view(), name="predictions"),
+    path("predictions/export/", PredictionExportView.as_view(), name="predictions-export"),
+    path("jobs/<uuid:pk>/", PredictionJobView.as_view(), name="prediction-job"),
 ]
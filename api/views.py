@@ -1,21 +1,42 @@
 from rest_framework import generics
 from django.contrib.auth.models import User
-from .serializers import RegisterSerializer, PredictionSerializer
+from .serializers import RegisterSerializer, PredictionSerializer, PredictionJobSerializer
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from rest_framework.authentication import SessionAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication
 from django.contrib.auth.decorators import login_required
-from django.shortcuts import render, redirect
-from django.utils import timezone
+from django.shortcuts import render, redirect, get_object_or_404
 from django.utils.http import urlsafe_base64_decode
 from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, FileResponse, HttpResponseNotModified, Http404, StreamingHttpResponse
 from django.conf import settings
-from .models import Prediction, Membership, TelegramUser
-from .predictor import fetch_stock_data, generate_prediction, create_charts
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, Q, Subquery
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from .models import Prediction, Membership, TelegramUser, PredictionJob
+from .predictor import model_registry, parse_horizon
+from .services import (
+    HISTORY_CACHE_TTL, history_cache_key, predict_ticker, predict_tickers, prediction_cache, record_prediction, record_predictions,
+)
+from .charts import ChartDataMissing, open_chart, plot_urls
+from .export import FORMATS as EXPORT_FORMATS, export_stream
+from .jobs import job_pool
+from .pricestore import normalize_ticker
+from .pagination import PredictionCursorPagination
+from .quota import QuotaExceeded, consume, forget_paid_status, is_paid, refund, reserve
+from .telemetry import metrics
 import stripe
 import os
+import re
+from datetime import datetime, time, timedelta
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
@@ -25,7 +46,18 @@ class RegisterView(generics.CreateAPIView):
 
 @api_view(['GET'])
 def health_check(request):
-    return Response({"status": "ok"})
+    return Response({
+        "status": "ok",
+        "model": model_registry.stats(),
+        "prediction_cache": prediction_cache.stats(),
+    })
+
+def metrics_view(request):
+    # Prometheus text exposition; guarded by a bearer token when METRICS_TOKEN is set.
+    token = settings.METRICS_TOKEN
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return HttpResponse("Unauthorized", status=401)
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
 
 # 🔐 API view with JWT auth
 class PredictView(APIView):
@@ -35,98 +67,268 @@ class PredictView(APIView):
         ticker = request.data.get("ticker")
         if not ticker:
             return Response({"error": "Ticker is required"}, status=400)
+        try:
+            ticker = normalize_ticker(ticker)
+            horizon = parse_horizon(request.data.get("horizon", 1))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
 
-        membership, _ = Membership.objects.get_or_create(user=request.user)
-
-        if not membership.is_paid:
-            today_start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
-            count = Prediction.objects.filter(user=request.user, created_at__gte=today_start).count()
-            if count >= 5:
-                return Response({"error": "Free tier daily limit (5 predictions) reached. Upgrade for unlimited access."}, status=403)
+        run_async = request.query_params.get("async") in ("1", "true")
+        try:
+            quota_day = reserve(request.user)
+        except QuotaExceeded:
+            return Response({"error": "Free tier daily limit (5 predictions) reached. Upgrade for unlimited access."}, status=403)
+
+        if run_async:
+            # The job refunds the reservation if it fails.
+            job = PredictionJob.objects.create(user=request.user, ticker=ticker, horizon=horizon, quota_day=quota_day)
+            transaction.on_commit(job_pool.wake)
+            return Response({
+                "job_id": str(job.id),
+                "status": job.status,
+                "status_url": reverse("prediction-job", args=[job.id]),
+            }, status=202)
 
         try:
-            df = fetch_stock_data(ticker)
-            next_price, scaler = generate_prediction(df)
-            chart1, chart2 = create_charts(df, next_price, scaler, ticker=ticker)
+            result = predict_ticker(ticker, horizon)
+            prediction = record_prediction(request.user, result)
         except Exception as e:
+            refund(request.user, quota_day)
             return Response({"error": str(e)}, status=500)
 
-        Prediction.objects.create(
-            user=request.user,
-            ticker=ticker.upper(),
-            predicted_price=round(next_price, 2),
-            metrics={},
-            chart1_path=chart1,
-            chart2_path=chart2,
-        )
-
         return Response({
-            "ticker": ticker.upper(),
-            "next_day_price": round(next_price, 2),
-            "plot_urls": [chart1, chart2]
+            "ticker": prediction.ticker,
+            "next_day_price": prediction.predicted_price,
+            "forecast": result["forecast"],
+            "plot_urls": plot_urls(prediction),
         })
 
+class BatchPredictView(APIView):
+    permission_classes = [IsAuthenticated]
+    max_tickers = 50
+
+    def post(self, request):
+        tickers = request.data.getlist("tickers") if hasattr(request.data, "getlist") else request.data.get("tickers")
+        if not isinstance(tickers, list) or not tickers:
+            return Response({"error": "A list of tickers is required"}, status=400)
+        if len(tickers) > self.max_tickers:
+            return Response({"error": f"At most {self.max_tickers} tickers per batch"}, status=400)
+        try:
+            horizon = parse_horizon(request.data.get("horizon", 1))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+
+        items = []
+        for raw in tickers:
+            try:
+                items.append({"ticker": normalize_ticker(str(raw))})
+            except ValueError as e:
+                items.append({"ticker": str(raw), "error": str(e)})
+        valid = list(dict.fromkeys(item["ticker"] for item in items if "error" not in item))
+
+        try:
+            quota_day = reserve(request.user, len(valid)) if valid else None
+        except QuotaExceeded as e:
+            return Response({
+                "error": f"Free tier daily limit (5 predictions) reached: {e.remaining} remaining today. Upgrade for unlimited access."
+            }, status=403)
+
+        try:
+            results, errors = predict_tickers(valid, horizon) if valid else ({}, {})
+            predictions = record_predictions(request.user, [results[ticker] for ticker in valid if ticker in results])
+        except Exception as e:
+            refund(request.user, quota_day, len(valid))
+            return Response({"error": str(e)}, status=500)
+        # Only tickers that produced a prediction are charged.
+        refund(request.user, quota_day, len(valid) - len(predictions))
+        by_ticker = {prediction.ticker: prediction for prediction in predictions}
+
+        for item in items:
+            ticker = item["ticker"]
+            if ticker in by_ticker:
+                item["next_day_price"] = by_ticker[ticker].predicted_price
+                item["forecast"] = results[ticker]["forecast"]
+                item["plot_urls"] = plot_urls(by_ticker[ticker])
+            elif ticker in errors:
+                item["error"] = errors[ticker]
+        return Response({"results": items})
+
+class PredictionJobView(generics.RetrieveAPIView):
+    serializer_class = PredictionJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return PredictionJob.objects.filter(user=self.request.user).select_related("prediction")
+
+class ChartView(APIView):
+    # Renders a prediction's chart on first request and serves the cached PNG
+    # afterwards. Session auth lets the dashboard's <img> tags load it.
+    authentication_classes = [SessionAuthentication, JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, prediction_id, kind):
+        prediction = get_object_or_404(Prediction.objects.only("ticker", "metrics"), pk=prediction_id, user=request.user)
+        try:
+            etag, f = open_chart(prediction, kind)
+        except ChartDataMissing:
+            raise Http404
+
+        quoted = f'"{etag}"'
+        if request.headers.get("If-None-Match") == quoted:
+            f.close()
+            response = HttpResponseNotModified()
+        else:
+            response = FileResponse(f, content_type="image/png")
+        response["ETag"] = quoted
+        response["Cache-Control"] = "private, max-age=86400"
+        return response
+
+def _filter_ticker(qs, request):
+    ticker = request.query_params.get("ticker")
+    if ticker:
+        try:
+            qs = qs.filter(ticker=normalize_ticker(ticker))
+        except ValueError as e:
+            raise ValidationError({"ticker": str(e)})
+    return qs
+
+def _filter_dates(qs, request):
+    # ?since= and ?until= are inclusive YYYY-MM-DD days in TIME_ZONE,
+    # compared as datetimes so the (user, created_at) index is used.
+    for param, lookup, offset in (("since", "created_at__gte", 0), ("until", "created_at__lt", 1)):
+        value = request.query_params.get(param)
+        if not value:
+            continue
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise ValidationError({param: "Expected a date as YYYY-MM-DD"})
+        qs = qs.filter(**{lookup: timezone.make_aware(datetime.combine(day + timedelta(days=offset), time.min))})
+    return qs
+
+ACCEPTS_GZIP = re.compile(r"\bgzip\b")
+
 class PredictionListView(generics.ListAPIView):
+    # ?fields=ticker,predicted_price limits the columns returned and
+    # ?include=backtest adds the stored series to `metrics`.
     serializer_class = PredictionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PredictionCursorPagination
+
+    def _requested_fields(self):
+        fields = self.request.query_params.get("fields")
+        return [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+
+    def get_serializer(self, *args, **kwargs):
+        include = self.request.query_params.get("include", "").split(",")
+        kwargs["fields"] = self._requested_fields()
+        kwargs["include_backtest"] = "backtest" in include
+        return super().get_serializer(*args, **kwargs)
 
     def get_queryset(self):
-        qs = Prediction.objects.filter(user=self.request.user)
-        ticker = self.request.query_params.get("ticker")
-        if ticker:
-            qs = qs.filter(ticker__iexact=ticker)
-        return qs.order_by("-created_at")
+        qs = _filter_ticker(Prediction.objects.filter(user=self.request.user), self.request)
+        fields = self._requested_fields()
+        if fields is not None and "metrics" not in fields:
+            qs = qs.defer("metrics")
+        return qs
+
+class PredictionExportView(APIView):
+    # Streams the whole history as ?format=csv|ndjson, newest first, without
+    # building it in memory; gzipped on the fly when the client accepts it.
+    permission_classes = [IsAuthenticated]
+
+    def perform_content_negotiation(self, request, force=False):
+        # ?format= selects the export format here, not a DRF renderer.
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request):
+        fmt = request.query_params.get("format", "csv")
+        if fmt not in EXPORT_FORMATS:
+            raise ValidationError({"format": "Expected one of: " + ", ".join(EXPORT_FORMATS)})
+        qs = _filter_dates(_filter_ticker(Prediction.objects.filter(user=request.user), request), request)
+        gzip = bool(ACCEPTS_GZIP.search(request.headers.get("Accept-Encoding", "")))
+
+        response = StreamingHttpResponse(
+            export_stream(qs.order_by("-created_at", "-id"), fmt, gzip=gzip), content_type=EXPORT_FORMATS[fmt]
+        )
+        response["Content-Disposition"] = f'attachment; filename="predictions.{fmt}"'
+        response["Vary"] = "Accept-Encoding"
+        if gzip:
+            response["Content-Encoding"] = "gzip"
+        return response
 
 # 🧑 Session-pro
 
+HISTORY_PAGE_SIZE = 20
+MAX_ID = 2 ** 63 - 1  # Largest id SQLite and PostgreSQL bigint can hold.
+HORIZON_CHOICES = (1, 5, 10, 20)
+
+def _past_predictions(user, before=None):
+    # One bounded page of history, newest first, as plain dicts of the
+    # displayed columns. `before` (a prediction id) continues after that
+    # row using a (created_at, id) keyset, so older pages cost the same
+    # single query as the first. A `before` row that no longer exists falls
+    # back to the first page.
+    qs = Prediction.objects.filter(user=user)
+    if before:
+        anchor_row = Prediction.objects.filter(user=user, pk=before)
+        anchor = Subquery(anchor_row.values("created_at")[:1])
+        qs = qs.filter(Q(created_at__lt=anchor) | Q(created_at=anchor, pk__lt=before) | ~Exists(anchor_row))
+    page = list(qs.order_by("-created_at", "-id").values("id", "ticker", "predicted_price", "created_at")[:HISTORY_PAGE_SIZE + 1])
+    older = page[HISTORY_PAGE_SIZE - 1]["id"] if len(page) > HISTORY_PAGE_SIZE else None
+    return page[:HISTORY_PAGE_SIZE], older
+
+def _history_cursor(value):
+    # A row id within the database's integer range, or None for the first page.
+    if value.isascii() and value.isdigit() and len(value) <= 19 and 0 < int(value) <= MAX_ID:
+        return int(value)
+    return None
+
+def _history_html(request):
+    # The rendered history list, cached per user and page until the user's
+    # next prediction from any process (see services.history_cache_key).
+    before = _history_cursor(request.GET.get("before", ""))
+    key = history_cache_key(request.user.pk, before)
+    html = cache.get(key)
+    if html is None:
+        past_predictions, older = _past_predictions(request.user, before)
+        html = render_to_string("dashboard_history.html", {
+            "past_predictions": past_predictions,
+            "older_cursor": older,
+            "paged": before is not None,
+        })
+        cache.set(key, html, HISTORY_CACHE_TTL)
+    return html
+
 @login_required
 def dashboard(request):
-    prediction = None
-    chart1_url = chart2_url = None
     user = request.user
+    # Paid status is looked up once (and cached); consume() reuses it.
+    context = {"is_paid": is_paid(user), "horizon_choices": HORIZON_CHOICES}
 
     if request.method == "POST":
         ticker = request.POST.get("ticker", "").strip()
 
         if ticker:
-            membership, _ = Membership.objects.get_or_create(user=user)
-            today_start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
-            today_predictions = Prediction.objects.filter(user=user, created_at__gte=today_start).count()
-
-            if not membership.is_paid and today_predictions >= 5:
-                return render(request, "dashboard.html", {
-                    "error": "Free tier daily limit (5 predictions) reached. Upgrade to continue.",
-                    "past_predictions": Prediction.objects.filter(user=user).order_by("-created_at")
-                })
-
             try:
-                df = fetch_stock_data(ticker)
-                next_price, scaler = generate_prediction(df)
-                chart1, chart2 = create_charts(df, next_price, scaler, ticker=ticker)
-
-                prediction = Prediction.objects.create(
-                    user=user,
-                    ticker=ticker.upper(),
-                    predicted_price=round(next_price, 2),
-                    metrics={},
-                    chart1_path=chart1,
-                    chart2_path=chart2,
+                horizon = parse_horizon(request.POST.get("horizon") or 1)
+                with consume(user):
+                    result = predict_ticker(ticker, horizon)
+                    prediction = record_prediction(user, result)
+                chart1_url, chart2_url, *rest = plot_urls(prediction)
+                context.update(
+                    prediction=prediction, chart1_url=chart1_url, chart2_url=chart2_url,
+                    forecast_url=rest[0] if rest else None,
                 )
-                chart1_url = chart1
-                chart2_url = chart2
+            except QuotaExceeded:
+                context["error"] = "Free tier daily limit (5 predictions) reached. Upgrade to continue."
             except Exception as e:
-                return render(request, "dashboard.html", {
-                    "error": f"Error: {str(e)}",
-                    "past_predictions": Prediction.objects.filter(user=user).order_by("-created_at")
-                })
-
-    return render(request, "dashboard.html", {
-        "prediction": prediction,
-        "chart1_url": chart1_url,
-        "chart2_url": chart2_url,
-        "past_predictions": Prediction.objects.filter(user=user).order_by("-created_at"),
-        "is_paid": Membership.objects.filter(user=request.user, is_paid=True).exists(),
-    })
+                context["error"] = f"Error: {str(e)}"
+
+    context["history_html"] = _history_html(request)
+    return render(request, "dashboard.html", context)
 
 
 def login_page(request):
@@ -142,6 +344,7 @@ def web_payment_success(request):
     membership, created = Membership.objects.get_or_create(user=user)
     membership.is_paid = True
     membership.save()
+    forget_paid_status(user)
 
     return render(request, "payment_success.html", {
         "message": "Web: Payment successful. You are now a premium member!"
@@ -155,6 +358,7 @@ def telegram_payment_success(request, uidb64):
         uid = urlsafe_base64_decode(uidb64).decode()
         user = User.objects.get(pk=uid)
         TelegramUser.objects.filter(user=user).update(is_paid=True)
+        forget_paid_status(user)
         return redirect(f"https://web.telegram.org/k/#{settings.BOT_USERNAME}")
     except Exception as e:
         print("Error in telegram_payment_success:", e)
@@ -0,0 +1,119 @@
+import asyncio
+import hmac
+import json
+import logging
+
+from telegram import Update
+
+from .config import getenv
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_WEBHOOK_PATH = getenv("TELEGRAM_WEBHOOK_PATH", "/telegram/webhook/")
+TELEGRAM_WEBHOOK_SECRET = getenv("TELEGRAM_WEBHOOK_SECRET")
+TELEGRAM_WEBHOOK_URL = getenv("TELEGRAM_WEBHOOK_URL")  # Public base URL; registers the webhook on startup.
+MAX_UPDATE_BYTES = 1 << 20
+
+
+class TelegramWebhook:
+    # ASGI wrapper that takes Telegram updates on one path and hands every
+    # other request to the Django app. Updates go to the same handlers as
+    # polling mode (api.bot), inside the web worker, so the bot shares its
+    # warm model, caches and database connections.
+
+    def __init__(self, app, bot_factory, path=TELEGRAM_WEBHOOK_PATH, secret=TELEGRAM_WEBHOOK_SECRET,
+                 public_url=TELEGRAM_WEBHOOK_URL):
+        if not secret:
+            raise ValueError("A webhook secret token is required")
+        self.app = app
+        self.bot_factory = bot_factory
+        self.path = path
+        self.secret = secret
+        self.public_url = public_url
+        self.bot = None
+        self._lock = asyncio.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        if scope["type"] == "http" and scope["path"] == self.path:
+            return await self._webhook(scope, receive, send)
+        return await self.app(scope, receive, send)
+
+    async def startup(self):
+        async with self._lock:
+            if self.bot is None:
+                bot = self.bot_factory()
+                await bot.initialize()
+                await bot.start()
+                if self.public_url:
+                    await bot.bot.set_webhook(self.public_url.rstrip("/") + self.path, secret_token=self.secret)
+                self.bot = bot
+
+    async def shutdown(self):
+        async with self._lock:
+            if self.bot is not None:
+                await self.bot.stop()
+                await self.bot.shutdown()
+                self.bot = None
+
+    async def _lifespan(self, receive, send):
+        # Django's ASGI handler does not speak lifespan, so it is handled
+        # here; servers without lifespan support start the bot lazily.
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.startup()
+                except Exception as e:
+                    logger.exception("Telegram webhook startup failed")
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _webhook(self, scope, receive, send):
+        if scope["method"] != "POST":
+            return await _respond(send, 405, b"Method not allowed")
+        headers = dict(scope.get("headers") or [])
+        token = headers.get(b"x-telegram-bot-api-secret-token", b"")
+        if not hmac.compare_digest(token, self.secret.encode()):
+            return await _respond(send, 403, b"Forbidden")
+
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if len(body) > MAX_UPDATE_BYTES:
+                return await _respond(send, 413, b"Update too large")
+            if not message.get("more_body"):
+                break
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return await _respond(send, 400, b"Invalid JSON")
+
+        await self.startup()
+        try:
+            update = Update.de_json(data, self.bot.bot)
+        except Exception:
+            # Acknowledged anyway: Telegram would otherwise resend the same
+            # update until it gives up.
+            logger.exception("Dropped a webhook body that is not a valid update")
+            return await _respond(send, 200, b"ignored")
+        # Queued rather than awaited: Telegram gets its 200 right away and the
+        # application processes updates concurrently, as in polling mode.
+        await self.bot.update_queue.put(update)
+        return await _respond(send, 200, b"ok")
+
+
+async def _respond(send, status, body):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"text/plain"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
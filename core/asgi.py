@@ -14,3 +14,17 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_asgi_application()
+
+# Run jobs queued while no web process was up, and fail any left running by
+# a worker that died.
+from api.jobs import job_pool  # noqa: E402
+
+job_pool.wake()
+
+# Telegram webhook mode: updates are posted to TELEGRAM_WEBHOOK_PATH and
+# handled in this process instead of by a separate polling bot.
+if os.getenv('TELEGRAM_WEBHOOK_SECRET'):
+    from api.bot import build_application
+    from api.webhook import TelegramWebhook
+
+    application = TelegramWebhook(application, lambda: build_application(webhook=True))
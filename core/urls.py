@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.urls import path, include
-from api.views import health_check,dashboard,login_page,register_page,create_checkout_session,stripe_webhook,payment_cancel,web_payment_success,telegram_payment_success,telegram_checkout
+from api.views import ChartView,health_check,metrics_view,dashboard,login_page,register_page,create_checkout_session,stripe_webhook,payment_cancel,web_payment_success,telegram_payment_success,telegram_checkout
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib.auth import views as auth_views
@@ -11,6 +11,8 @@ urlpatterns = [
     path("login/", login_page, name="login"),
     path('api/v1/', include('api.urls')),
     path('healthz/', health_check, name='healthz'),
+    path('metrics/', metrics_view, name='metrics'),
+    path('charts/<int:prediction_id>/<str:kind>.png', ChartView.as_view(), name='chart'),
     path('create-checkout-session/', create_checkout_session, name='create_checkout_session'),
     path("webhook/", stripe_webhook, name="stripe-webhook"), 
     path("success/", web_payment_success, name="payment_success"),
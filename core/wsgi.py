@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_wsgi_application()
+
+# Run jobs queued while no web process was up, and fail any left running by
+# a worker that died.
+from api.jobs import job_pool  # noqa: E402
+
+job_pool.wake()
@@ -0,0 +1,21 @@
+from api.config import getenv, getenv_bool, getenv_int
+
+bind = getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = getenv_int("GUNICORN_WORKERS", 1)
+threads = getenv_int("GUNICORN_THREADS", 2)
+
+# TensorFlow is not fork-safe, so the app is not preloaded in the master.
+# Instead each worker can warm itself up once it has loaded the app.
+WARMUP_ON_FORK = getenv_bool("WARMUP_ON_FORK")
+
+
+def post_worker_init(worker):
+    if not WARMUP_ON_FORK:
+        return
+    import time
+
+    from api.services import warmup
+
+    started = time.perf_counter()
+    warmup()
+    worker.log.info("Worker %s warmed up in %.2fs", worker.pid, time.perf_counter() - started)